@@ -0,0 +1,76 @@
+"""
+Compares the run time of the available json_utils backends (see json_utils.get_backends()),
+using the sample JSON files (resources/files/json).
+
+The output of each backend is checked against that of the stdlib json module.
+
+Usage (from the project root dir):
+    PYTHONPATH=src python resources/snippets/benchmarks/json_backends.py [repeat]
+"""
+
+import glob
+import os
+import sys
+import timeit
+
+from clifunzone import json_utils
+
+SAMPLES_DIR = os.path.join('resources', 'files', 'json')
+
+
+def load_samples():
+    """
+    Reads the (valid) sample files.
+    """
+    samples = []
+    for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.json'))):
+        with open(path) as f:
+            s = f.read()
+        if json_utils.contains_valid_json(s):
+            samples.append(s)
+    return samples
+
+
+def time_it(func, repeat):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange() if hasattr(timer, 'autorange') else (1, None)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run_all(samples):
+    """
+    Runs the operations (on all the samples) with the current backend.
+
+    :return: a list of the (loaded and dumped) results.
+    """
+    results = []
+    for s in samples:
+        data = json_utils.loads_ordered(s)
+        results.append((data, json_utils.dumps(data, separators=(',', ':')),
+                        json_utils.dumps(data, indent=2, separators=(',', ': '))))
+    return results
+
+
+def main(repeat):
+    samples = load_samples()
+    print('%d sample files (%d bytes)' % (len(samples), sum(len(s) for s in samples)))
+
+    json_utils.set_backend('json')
+    expected = run_all(samples)
+    data = [r[0] for r in expected]
+    ops = [
+        ('loads_ordered', lambda: [json_utils.loads_ordered(s) for s in samples]),
+        ('dumps (compact)', lambda: [json_utils.dumps(d, separators=(',', ':')) for d in data]),
+        ('dumps (indent)', lambda: [json_utils.dumps(d, indent=2, separators=(',', ': ')) for d in data]),
+    ]
+    print('%12s %16s %12s' % ('backend', 'operation', 'time (s)'))
+    for name in json_utils.get_backends():
+        json_utils.set_backend(name)
+        assert run_all(samples) == expected, 'the %s output differs from that of the json module' % name
+        for op, func in ops:
+            print('%12s %16s %12.6f' % (name, op, time_it(func, repeat)))
+    json_utils.set_backend()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,71 @@
+"""
+Compares the run time of txt_utils.get_index_distance_stats() with that of the original
+(Cartesian product based) implementation, using large synthetic token streams.
+
+Usage (from the project root dir):
+    PYTHONPATH=src python resources/snippets/benchmarks/txt_distance_stats.py [max_matches]
+"""
+
+import itertools
+import random
+import sys
+import timeit
+
+from clifunzone import txt_utils
+
+# the original implementation is skipped once the number of pairs exceeds this limit (it would take too long)
+MAX_PRODUCT_PAIRS = 25 * 1000 * 1000
+
+
+def product_index_distance_stats(indexes1, indexes2):
+    """
+    The original (Cartesian product based) implementation of txt_utils.get_index_distance_stats(),
+    kept as the baseline.
+    """
+    distances = [abs(x[0] - x[1]) for x in itertools.product(indexes1, indexes2)]
+    return {'min': min(distances), 'max': max(distances), 'mean': sum(distances) / float(len(distances))}
+
+
+def synthetic_tokens(matches, vocabulary_size=1000, seed=0):
+    """
+    Generates a token stream with (approximately) the specified number of matches for each of 2 'search' words.
+    """
+    rnd = random.Random(seed)
+    vocabulary = ['w%d' % i for i in range(vocabulary_size)]
+    length = matches * 20
+    tokens = [rnd.choice(vocabulary) for _ in range(length)]
+    for word in ('alpha', 'omega'):
+        for i in rnd.sample(range(length), matches):
+            tokens[i] = word
+    return tokens
+
+
+def time_it(func, *args):
+    timer = timeit.Timer(lambda: func(*args))
+    number, _ = timer.autorange() if hasattr(timer, 'autorange') else (1, None)
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def main(max_matches):
+    print('%10s %10s %14s %12s %12s %10s' % ('tokens', 'matches', 'pairs', 'old (s)', 'new (s)', 'speedup'))
+    matches = 100
+    while matches <= max_matches:
+        tokens = synthetic_tokens(matches)
+        indexes1 = set(i for i, _ in txt_utils.find_all('alpha', tokens))
+        indexes2 = set(i for i, _ in txt_utils.find_all('omega', tokens))
+        pairs = len(indexes1) * len(indexes2)
+
+        new_time = time_it(txt_utils.get_index_distance_stats, indexes1, indexes2)
+        if pairs <= MAX_PRODUCT_PAIRS:
+            assert product_index_distance_stats(indexes1, indexes2) == \
+                txt_utils.get_index_distance_stats(indexes1, indexes2)
+            old_time = time_it(product_index_distance_stats, indexes1, indexes2)
+            print('%10d %10d %14d %12.6f %12.6f %9.0fx' % (
+                len(tokens), matches, pairs, old_time, new_time, old_time / new_time))
+        else:
+            print('%10d %10d %14d %12s %12.6f %10s' % (len(tokens), matches, pairs, '(skipped)', new_time, ''))
+        matches *= 5
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 62500)
@@ -0,0 +1,116 @@
+"""
+Compares the dict allocations (and run time) of xml2json.elem_to_internal() with those of
+the original (recursive) implementation, for each of the resources/files/json/*.xml sample files.
+
+Usage (from the project root dir):
+    PYTHONPATH=src python resources/snippets/benchmarks/xml2json_allocations.py [xml_file ...]
+"""
+
+import glob
+import os
+import sys
+import timeit
+from collections import OrderedDict
+
+from clifunzone import xml2json
+from clifunzone.xml2json import ET
+from clifunzone.xml2json import strip_tag
+
+DEFAULT_FILES = os.path.join(os.path.dirname(__file__), '..', '..', 'files', 'json', '*.xml')
+
+
+def recursive_elem_to_internal(elem, strip_attribute=False, strip_namespace=True, strip_whitespace=True,
+                               factory=None):
+    """
+    The original (recursive) implementation of xml2json.elem_to_internal(), kept as the baseline.
+    """
+
+    if factory is None:
+        factory = OrderedDict
+
+    d = factory()
+
+    elem_tag = elem.tag
+    if strip_namespace:
+        elem_tag = strip_tag(elem.tag)
+
+    if not strip_attribute:
+        for key, value in list(elem.attrib.items()):
+            d['@' + key] = value
+
+    for subelem in elem:
+        v = recursive_elem_to_internal(subelem, strip_attribute=strip_attribute, strip_namespace=strip_namespace,
+                                       strip_whitespace=strip_whitespace, factory=factory)
+
+        tag = subelem.tag
+        if strip_namespace:
+            tag = strip_tag(subelem.tag)
+
+        value = v[tag]
+
+        try:
+            d[tag].append(value)
+        except AttributeError:
+            d[tag] = [d[tag], value]
+        except KeyError:
+            d[tag] = value
+    text = elem.text
+    tail = elem.tail
+    if strip_whitespace:
+        if text:
+            text = text.strip()
+        if tail:
+            tail = tail.strip()
+
+    if tail:
+        d['#tail'] = tail
+
+    if d:
+        if text:
+            d["#text"] = text
+    else:
+        d = text or None
+    return factory([(elem_tag, d)])
+
+
+class CountingOrderedDict(OrderedDict):
+    """An OrderedDict that counts its instantiations."""
+
+    count = 0
+
+    def __init__(self, *args, **kwargs):
+        CountingOrderedDict.count += 1
+        super(CountingOrderedDict, self).__init__(*args, **kwargs)
+
+
+def count_allocations(func, elem):
+    CountingOrderedDict.count = 0
+    result = func(elem, factory=CountingOrderedDict)
+    return CountingOrderedDict.count, result
+
+
+def main(paths):
+    print('%-40s %8s %10s %10s %10s %10s' % ('file', 'elements', 'dicts(old)', 'dicts(new)', 'ms(old)', 'ms(new)'))
+    totals = [0, 0]
+    for path in paths:
+        try:
+            elem = ET.parse(path).getroot()
+        except ET.ParseError as e:
+            print('%-40s skipped (%s)' % (os.path.basename(path), e))
+            continue
+        old_count, old_result = count_allocations(recursive_elem_to_internal, elem)
+        new_count, new_result = count_allocations(xml2json.elem_to_internal, elem)
+        assert old_result == new_result, 'output differs for: %s' % path
+        totals[0] += old_count
+        totals[1] += new_count
+
+        number = 200
+        old_time = timeit.timeit(lambda: recursive_elem_to_internal(elem), number=number) * 1000 / number
+        new_time = timeit.timeit(lambda: xml2json.elem_to_internal(elem), number=number) * 1000 / number
+        print('%-40s %8d %10d %10d %10.3f %10.3f' % (
+            os.path.basename(path), len(list(elem.iter())), old_count, new_count, old_time, new_time))
+    print('%-40s %8s %10d %10d' % ('total', '', totals[0], totals[1]))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or sorted(glob.glob(DEFAULT_FILES)))
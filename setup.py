@@ -122,6 +122,8 @@ setup(
         # eg:
         #   'rst': ['docutils>=0.11'],
         #   ':python_version=="2.6"': ['argparse'],
+        'numpy': ['numpy'],
+        'simplejson': ['simplejson'],
     },
     entry_points={
         'console_scripts': [
@@ -1,6 +1,15 @@
+import glob
+import io
+import os
+import sys
+from importlib import import_module
 from pprint import pformat
 
 import click
+from six import PY2
+from six.moves import cStringIO as StringIO
+
+from clifunzone import multiprocessing_utils
 
 CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
 
@@ -34,6 +43,145 @@ def inherit_parent_params(ctx, params):
     for k in params:
         ctx.params[k] = parent.params[k]
 
+
+def echo_chunks(chunks, nl=True, buffer_size=65536):
+    """
+    Outputs an iterable of string chunks (e.g. from an incremental encoder) via click.echo().
+
+    Chunks are buffered, so that the output is written in (roughly) buffer_size pieces,
+    rather than once per (typically tiny) chunk.
+
+    :param chunks: an iterable of strings. Or of bytes objects (e.g. see input_utils.iter_chunks()),
+        which click.echo() writes to the binary stdout (i.e. as is) on py3.
+    :param nl: if True, a newline is output after the last chunk.
+    :param buffer_size: the (approximate) number of chars to buffer between writes.
+    """
+    buf = []
+    size = 0
+    # the chunks are joined with an empty string of the same type (i.e. bytes chunks are not mixed with text)
+    empty = ''
+    for chunk in chunks:
+        if not buf:
+            empty = chunk[:0]
+        buf.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            click.echo(empty.join(buf), nl=False)
+            buf = []
+            size = 0
+    click.echo(empty.join(buf), nl=nl)
+
+
+def expand_input_paths(patterns):
+    """
+    Expands input path patterns into a list of (file) paths.
+
+    Each pattern can be a file path, a directory path (i.e. all files directly within the directory),
+    or a glob pattern (e.g. 'data/*.xml'). Patterns which match nothing are passed through unchanged
+    (so that they can be reported as missing).
+
+    :param patterns: an iterable of path patterns.
+    :return: a list of paths.
+
+    >>> expand_input_paths(['no/such/file.xml', 'no/such/*.xml'])
+    ['no/such/file.xml', 'no/such/*.xml']
+    """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(os.path.join(pattern, name) for name in os.listdir(pattern))
+            paths.extend(path for path in matches if os.path.isfile(path))
+        elif not os.path.exists(pattern) and glob.has_magic(pattern) and glob.glob(pattern):
+            paths.extend(path for path in sorted(glob.glob(pattern)) if os.path.isfile(path))
+        else:
+            paths.append(pattern)
+    return paths
+
+
+def _invoke_with_input(task):
+    """
+    Invokes a CLI command for a single input file, capturing its output.
+
+    Note: This is a module-level function, so that it can be run by a <multiprocessing.Pool>.
+
+    :param task: a (module name, group name, command args, input path, group params) tuple.
+        The group params (e.g. global options) are applied as the defaults of the group's options.
+    :return: an (input path, exit code, output, error message) tuple.
+    """
+    module_name, group_name, args, path, group_params = task
+    group = getattr(import_module(module_name), group_name)
+
+    # capture the output (similar to click's CliRunner)
+    old_stdout = sys.stdout
+    bytes_output = StringIO() if PY2 else io.BytesIO()
+    # Note: a reference to the (py3) wrapper is kept, so that it can be detached (rather than garbage collected,
+    # which would close bytes_output)
+    stdout = bytes_output if PY2 else io.TextIOWrapper(bytes_output, encoding='utf-8')
+    sys.stdout = stdout
+    exit_code, error = 0, None
+    try:
+        group.main(args=list(args) + ['--input', path], prog_name=group_name, standalone_mode=False,
+                   default_map=group_params)
+    except click.ClickException as e:
+        exit_code, error = e.exit_code, e.format_message()
+    except click.Abort:
+        exit_code, error = 1, 'Aborted!'
+    except SystemExit as e:
+        exit_code = e.code or 0
+    except Exception as e:
+        exit_code, error = 1, '%s: %s' % (type(e).__name__, e)
+    finally:
+        stdout.flush()
+        if not PY2:
+            stdout.detach()
+        sys.stdout = old_stdout
+    if exit_code and not error:
+        error = 'exit code: %s' % exit_code
+    output = bytes_output.getvalue()
+    if not PY2:
+        output = output.decode('utf-8', 'replace')
+    return path, exit_code, output, error
+
+
+class MultiInputGroup(click.Group):
+    """
+    A <click.Group> which (optionally) runs its subcommand once per input file, using a pool of processes.
+
+    The group must have 'inputs' (i.e. path patterns, see expand_input_paths()) and 'jobs' (i.e. process count)
+    params. If any inputs are specified, the subcommand (and its args) is invoked once per input file
+    (with the '--input' option set to the input file), and the output of each invocation is echoed
+    (in input order) under a '==> path <==' header. Failures do not abort the other invocations,
+    but are instead reported (per file) in a summary at the end.
+    The group's other params (e.g. global options) are forwarded to each invocation.
+    """
+
+    def invoke(self, ctx):
+        inputs = ctx.params.get('inputs')
+        if not inputs or not ctx.protected_args:
+            return super(MultiInputGroup, self).invoke(ctx)
+
+        args = ctx.protected_args + ctx.args
+        # resolve the subcommand first, so that an unknown subcommand is still reported as a usage error
+        self.resolve_command(ctx, list(args))
+        paths = expand_input_paths(inputs)
+        # forward the group's other (e.g. global) options to each invocation
+        group_params = dict((k, v) for k, v in ctx.params.items() if k not in ('inputs', 'jobs'))
+        tasks = ((self.callback.__module__, self.callback.__name__, args, path, group_params) for path in paths)
+
+        errors = []
+        for path, exit_code, output, error in multiprocessing_utils.imap_processes(_invoke_with_input, tasks,
+                                                                                   processes=ctx.params.get('jobs')):
+            click.echo('==> %s <==' % path)
+            click.echo(output, nl=False)
+            if error:
+                errors.append((path, error))
+
+        click.echo('\nsummary: %s inputs, %s succeeded, %s failed' % (
+            len(paths), len(paths) - len(errors), len(errors)), err=True)
+        for path, error in errors:
+            click.echo('failed: %s: %s' % (path, error.strip()), err=True)
+        ctx.exit(1 if errors else 0)
+
 # def main():
 #     cli()
 #
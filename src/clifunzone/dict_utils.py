@@ -4,30 +4,105 @@ from collections import OrderedDict
 from collections import defaultdict
 
 
-def flatten(d, separator='_', parent_key=None):
+def iter_flatten(d, separator='_', parent_key=None):
     """
-    Converts a nested hierarchy of key/value object (e.g. a dict of dicts) into a flat (i.e. non-nested) dict.
+    Flattens a nested hierarchy of key/value objects (e.g. a dict of dicts) lazily, 1 (leaf) item at a time.
+
+    The hierarchy is traversed with an explicit stack (i.e. without recursion, so its depth is unlimited),
+    and each flattened key is joined (from its key segments) only once, when its leaf item is yielded.
 
     :param d: the dict (or any other instance of collections.MutableMapping) to be flattened.
     :param separator: the separator to use when concatenating nested key names into flattened key names.
-    :param parent_key: used internally for recursion.
-    :return: a flattened dict (i.e. containing no nested dicts as values).
+    :param parent_key: an (optional) prefix for the flattened key names.
+    :return: an iterable of (flattened key, value) tuples, in traversal order.
+
+    >>> list(iter_flatten(OrderedDict([('a', 1), ('c', OrderedDict([('a', 2), ('b', {'x': 5})])), ('d', [3])])))
+    [('a', 1), ('c_a', 2), ('c_b_x', 5), ('d', [3])]
+
+    >>> list(iter_flatten({'a': {'b': {}, 'c': None}}, separator='|', parent_key='p'))
+    [('p|a|c', None)]
     """
     if separator is None:
         separator = '_'
-    if parent_key is None:
-        parent_key = ''
 
+    # the key segments of the current path (shared by all the levels of the stack)
+    path = [parent_key] if parent_key else []
+    stack = [(iter(d.items()), False)]
+    while stack:
+        items, pushed = stack[-1]
+        for k, v in items:
+            if isinstance(v, MutableMapping):
+                # Note: (leading) False-y keys are omitted from the path (e.g. {'': {'a': 1}} yields 'a', not '_a')
+                push = bool(path or k)
+                if push:
+                    path.append(k)
+                stack.append((iter(v.items()), push))
+                break
+            yield separator.join(path + [k]) if path else k, v
+        else:
+            stack.pop()
+            if pushed:
+                path.pop()
+
+
+def flatten(d, separator='_', parent_key=None):
+    """
+    Converts a nested hierarchy of key/value object (e.g. a dict of dicts) into a flat (i.e. non-nested) dict.
+
+    :param d: the dict (or any other instance of collections.MutableMapping) to be flattened.
+    :param separator: the separator to use when concatenating nested key names into flattened key names.
+    :param parent_key: an (optional) prefix for the flattened key names.
+    :return: a flattened dict (i.e. containing no nested dicts as values).
+    """
     dict_type = dict if d is None else type(d)
+    return dict_type(iter_flatten(d, separator=separator, parent_key=parent_key))
 
-    items = []
-    for k, v in d.items():
-        new_key = parent_key + separator + k if parent_key else k
-        if isinstance(v, MutableMapping):
-            items.extend(flatten(v, separator=separator, parent_key=new_key).items())
-        else:
-            items.append((new_key, v))
-    return dict_type(items)
+
+def unflatten(d, separator='_', dict_type=None):
+    """
+    Converts a flat dict (e.g. see flatten()) back into a nested hierarchy of key/value objects (e.g. a dict of dicts).
+
+    The hierarchy is built like a trie: each flattened key name is split into its nested key names (once),
+    which are looked up (or added) level by level. So the time is linear in the total length of the key names.
+
+    For any dict without empty nested dicts or key names containing the separator (which flatten() cannot preserve),
+    unflatten(flatten(d, separator), separator) == d, including the (nested) key order.
+
+    :param d: the flat dict (or any other instance of collections.Mapping).
+    :param separator: the separator that was used to concatenate nested key names into flattened key names.
+    :param dict_type: the type of the (nested) dicts to create. Defaults to the type of d.
+    :return: a nested dict.
+    :raises ValueError: if a flattened key name conflicts with another (e.g. 'a' and 'a_b').
+
+    >>> unflatten(OrderedDict([('a', 1), ('c_a', 2), ('c_b_x', 5), ('d', [3])]))
+    OrderedDict([('a', 1), ('c', OrderedDict([('a', 2), ('b', OrderedDict([('x', 5)]))])), ('d', [3])])
+
+    >>> unflatten(OrderedDict([('a', None), ('a|b', 2)]), separator='|')
+    Traceback (most recent call last):
+    ValueError: conflicting key: a|b
+    """
+    if separator is None:
+        separator = '_'
+    if dict_type is None:
+        dict_type = type(d)
+
+    root = dict_type()
+    # the ids of the nested dicts created here (vs. dict values, which are leaves)
+    nodes = {id(root)}
+    for key, value in d.items():
+        names = key.split(separator)
+        node = root
+        for name in names[:-1]:
+            if name not in node:
+                node[name] = dict_type()
+                nodes.add(id(node[name]))
+            elif id(node[name]) not in nodes:
+                raise ValueError('conflicting key: %s' % key)
+            node = node[name]
+        if names[-1] in node:
+            raise ValueError('conflicting key: %s' % key)
+        node[names[-1]] = value
+    return root
 
 
 def format_keys(d, format_string):
@@ -123,22 +198,6 @@ def filter_none_values(d, recursive=True):
         else:
             return obj
 
-    def purify(o):
-        """Note: This one seems to be functionally equivalent to remove_none (at least for the cases I tested)."""
-        if hasattr(o, 'items'):
-            oo = type(o)()
-            for k in o:
-                if k is not None and o[k] is not None:
-                    oo[k] = purify(o[k])
-        elif hasattr(o, '__iter__'):
-            oo = []
-            for it in o:
-                if it is not None:
-                    oo.append(purify(it))
-        else:
-            return o
-        return type(o)(oo)
-
     def strip_none(data):
         """Note: This one doesn't support OrderedDict, etc."""
         if isinstance(data, dict):
@@ -160,7 +219,7 @@ def filter_none_values(d, recursive=True):
     if recursive:
         # return my_remove_none(d)
         # return remove_none(d)
-        return purify(d)
+        return _purify_none(d)
         # return strip_none(d)
     else:
         d = d.copy()
@@ -171,6 +230,27 @@ def filter_none_values(d, recursive=True):
         return d
 
 
+def _purify_none(o):
+    """
+    Creates a copy of an object (e.g. a dict or list), recursively omitting all None values (and keys).
+
+    Note: This one seems to be functionally equivalent to remove_none (at least for the cases I tested).
+    """
+    if hasattr(o, 'items'):
+        oo = type(o)()
+        for k in o:
+            if k is not None and o[k] is not None:
+                oo[k] = _purify_none(o[k])
+    elif hasattr(o, '__iter__'):
+        oo = []
+        for it in o:
+            if it is not None:
+                oo.append(_purify_none(it))
+    else:
+        return o
+    return type(o)(oo)
+
+
 def filter_empty_values(d, recursive=True):
     """
     Returns a filtered copy of a dict, with all keys associated with 'empty' values removed.
@@ -479,6 +559,119 @@ def remove_if(obj, test_func, output=False):
         return obj
 
 
+class Pipeline(object):
+    """
+    A composable sequence of transform steps (i.e. remove_if(), replace_values(), map_values() and
+    filter_none_values() steps), which are all applied to a dict-like object in a single traversal.
+
+    E.g. Pipeline().remove_if(f1).remove_if(f2).apply(d) has the same effect as remove_if(d, f1); remove_if(d, f2),
+    but walks the nested dicts once, rather than once per step.
+
+    The steps are applied (in order) to each key/value pair, once the nested dicts of the value have been transformed.
+    So a step which inspects a nested dict (e.g. lambda k, v: v == {}) sees its final content.
+
+    Note: apply() modifies the original instance (like remove_if() and replace_values()), not a copy.
+
+    >>> p = Pipeline().remove_if(lambda k, v: v is None).remove_if(lambda k, v: v == {})
+    >>> p.apply(OrderedDict([('a', '\\n'), ('b', OrderedDict([('c', None), ('d', {'e': None})])), ('f', 1)]))
+    OrderedDict([('a', '\\n'), ('f', 1)])
+
+    >>> p = Pipeline().filter_none_values().map_values(lambda v: v * 2)
+    >>> p.apply(OrderedDict([('a', [1, None]), ('b', None), ('c', {'d': 'x'})]))
+    OrderedDict([('a', [1, 1]), ('c', {'d': 'xx'})])
+
+    >>> Pipeline().replace_values(lambda v: len(v)).apply({'a': {'b': 'xyz'}})
+    {'a': 1}
+
+    >>> Pipeline().filter_none_values().apply(1)
+    Traceback (most recent call last):
+    TypeError: obj is not a MutableMapping object.
+    """
+
+    def __init__(self):
+        self.steps = []
+
+    def remove_if(self, test_func):
+        """
+        Adds a step which removes every key/value pair that matches a predicate (see remove_if()).
+
+        :param test_func: a predicate function that accepts a key and value as params.
+        :return: the pipeline (i.e. for chaining).
+        """
+        self.steps.append(('remove_if', test_func))
+        return self
+
+    def replace_values(self, func):
+        """
+        Adds a step which replaces every value, including nested dict-like ones (see replace_values()).
+
+        :param func: a mapping function.
+        :return: the pipeline (i.e. for chaining).
+        """
+        self.steps.append(('replace_values', func))
+        return self
+
+    def map_values(self, func):
+        """
+        Adds a step which maps every (non-dict) value (see map_values()).
+
+        :param func: a mapping function.
+        :return: the pipeline (i.e. for chaining).
+        """
+        self.steps.append(('map_values', func))
+        return self
+
+    def filter_none_values(self):
+        """
+        Adds a step which removes every key associated with a None value,
+        as well as any None values within (nested) lists (see filter_none_values()).
+
+        :return: the pipeline (i.e. for chaining).
+        """
+        self.steps.append(('filter_none_values', None))
+        return self
+
+    def apply(self, obj):
+        """
+        Applies the steps to a dict-like object (and to every nested dict-like object), in a single traversal.
+
+        :param obj: the dict-like object to transform.
+        :return: obj (i.e. the modified instance). Or obj as is, if there are no steps.
+        """
+        if not self.steps:
+            return obj
+        if not isinstance(obj, MutableMapping):
+            raise TypeError('obj is not a MutableMapping object.')
+
+        self._apply(obj)
+        return obj
+
+    def _apply(self, d):
+        for k, v in list(d.items()):
+            if isinstance(v, MutableMapping):
+                # i.e. the nested dict is transformed first
+                self._apply(v)
+            self._apply_steps(d, k, v)
+
+    def _apply_steps(self, d, k, v):
+        for kind, func in self.steps:
+            if kind == 'remove_if':
+                if func(k, v):
+                    del d[k]
+                    return
+            elif kind == 'replace_values':
+                v = func(v)
+            elif kind == 'map_values':
+                if not isinstance(v, collections.Mapping):
+                    v = func(v)
+            elif k is None or v is None:
+                del d[k]
+                return
+            elif isinstance(v, (list, tuple, set)):
+                v = _purify_none(v)
+        d[k] = v
+
+
 def pformat_od(od, mode='dict', s="", indent=' ' * 4, level=0):
     """
     Similar to pprint.pformat(...), but compatible with OrderedDicts.
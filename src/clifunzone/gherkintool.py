@@ -1,13 +1,18 @@
-import json
-from collections import Counter
+from collections import Mapping
 from pprint import pformat
 
 import click
 from gherkin.parser import Parser
+from six import PY2
 
 from clifunzone import click_utils
+from clifunzone import input_utils
+from clifunzone import json_utils
+from clifunzone.metrics_utils import CounterMetric
+from clifunzone.metrics_utils import ListMetric
+from clifunzone.metrics_utils import MetricsCollector
 from clifunzone.reflection_utils import varsdict
-from clifunzone.walk_items import walk_items
+from clifunzone.walk_items import iter_walk
 
 
 # from gherkin.pickles.compiler import compile  #as gherkin_compile
@@ -30,11 +35,7 @@ def echo(input, **kwargs):
     """
     Echo the (unparsed) input.
     """
-    if not input:
-        input = '-'
-    with click.open_file(input, mode='rb') as f:
-        s = f.read()
-        click.echo(s)
+    click_utils.echo_chunks(input_utils.iter_chunks(input))
 
 
 @cli.command(short_help='converts the input into an object model')
@@ -53,6 +54,9 @@ def parse(input, pyformat, sort_keys, **kwargs):
     with click.open_file(input, mode='rb') as f:
         parser = Parser()
         feature_text = f.read()
+        if not PY2:
+            # i.e. the parser requires text (not bytes) on py3
+            feature_text = feature_text.decode('utf-8')
         feature = parser.parse(feature_text)
         # click.echo(feature)
         # pickles = compile(feature, "path/to/the.feature")
@@ -63,7 +67,7 @@ def parse(input, pyformat, sort_keys, **kwargs):
         if pyformat:
             s = pformat(data)
         else:
-            s = json.dumps(data, indent=2, sort_keys=sort_keys)
+            s = json_utils.dumps(data, indent=2, sort_keys=sort_keys)
         click.echo(s)
 
 
@@ -83,21 +87,29 @@ def info(input, verbose, pyformat, **kwargs):
     with click.open_file(input, mode='rb') as f:
         parser = Parser()
         feature_text = f.read()
+        if not PY2:
+            # i.e. the parser requires text (not bytes) on py3
+            feature_text = feature_text.decode('utf-8')
         feature = parser.parse(feature_text)
 
+        # all the metrics are computed in a single walk of the AST's nodes (i.e. dicts)
+        nodes = (v for d, k, v, p in iter_walk(feature) if isinstance(v, Mapping))
+        results = MetricsCollector({
+            'Keywords': CounterMetric(func=lambda node: node.get('keyword')),
+            'Types': CounterMetric(func=lambda node: node.get('type')),
+            'Scenarios': ListMetric(['Scenario'], lambda node: node['name']),
+            'Steps': ListMetric(['Step'], lambda node: node['text']),
+            # 'Tables': CountMetric(['DataTable']),
+        }, node_type=lambda node: node.get('type')).collect(nodes)
+
         metrics = {}
-        steps = [a[-1] for d, k, v, a in walk_items(feature) if k == 'type' and v == 'Step']
-        scenarios = [a[-1] for d, k, v, a in walk_items(feature) if k == 'type' and v == 'Scenario']
-        # tables = [a[-1] for d, k, v, a in walk_items(feature) if k == 'type' and v == 'DataTable']
-        ctr_type = Counter((v for d, k, v in walk_items(feature, ancestors=False) if k == 'type'))
-        ctr_kw = Counter((v for d, k, v in walk_items(feature, ancestors=False) if k == 'keyword'))
         metrics.update({'count': {
-            'Keywords': ctr_kw,
-            'Types': ctr_type,
+            'Keywords': results['Keywords'],
+            'Types': results['Types'],
         }})
         metrics.update({'content': {
-            'Scenarios': [d['name'] for d in scenarios],
-            'Steps': [d['text'] for d in steps],
+            'Scenarios': results['Scenarios'],
+            'Steps': results['Steps'],
         }})
         data = metrics
 
@@ -109,7 +121,7 @@ def info(input, verbose, pyformat, **kwargs):
         if pyformat:
             s = pformat(data)
         else:
-            s = json.dumps(data, indent=2, sort_keys=True)
+            s = json_utils.dumps(data, indent=2, sort_keys=True)
         click.echo(s)
 
 
@@ -0,0 +1,339 @@
+import codecs
+import mmap
+import os
+import re
+import stat
+from contextlib import contextmanager
+from io import BytesIO
+
+import click
+from six import PY2
+
+CHUNK_SIZE = 65536
+
+_WHITESPACE_TOKEN = re.compile(br'\S+')
+
+_WHITESPACE = re.compile(br'\s')
+
+
+def is_regular_file(f):
+    """
+    Indicates whether a file object refers to a regular (i.e. seekable and mappable) file.
+
+    :param f: a file-like object.
+    :return: True if f is a regular file, else False (e.g. for pipes, ttys and in-memory streams).
+
+    >>> is_regular_file(BytesIO(b'abc'))
+    False
+    """
+    try:
+        return stat.S_ISREG(os.fstat(f.fileno()).st_mode)
+    except (AttributeError, EnvironmentError, ValueError):
+        # e.g. io.UnsupportedOperation (no fileno), or a closed file
+        return False
+
+
+@contextmanager
+def map_file(f):
+    """
+    Provides the entire content of an (open) file as a read-only buffer.
+
+    Regular (non-empty) files are memory-mapped, so no copy of the content is made
+    (i.e. the buffer can be sliced, searched, or scanned with regular expressions without loading the whole file).
+    Other files (e.g. stdin, pipes) are read into a bytes object, i.e. the whole content is held in memory.
+    So commands which can process their input in a single pass use iter_chunks() instead.
+    (E.g. xmltool tojson --echo uses a buffer, since it reads the input twice. txttool info --jobs only uses buffers
+    for regular files.)
+
+    :param f: a file-like object, opened in binary mode.
+    :return: a context manager which provides a <mmap.mmap> or bytes object.
+
+    >>> with map_file(BytesIO(b'abc')) as buf:
+    ...     buf
+    'abc'
+    """
+    if is_regular_file(f) and os.fstat(f.fileno()).st_size:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield buf
+        finally:
+            buf.close()
+    else:
+        yield f.read()
+
+
+@contextmanager
+def open_buffer(input=None):
+    """
+    Provides the entire content of an input file (or stdin) as a read-only buffer (see map_file()).
+
+    :param input: the path to the input file. Or '-' (or None) to use stdin.
+    :return: a context manager which provides a <mmap.mmap> or bytes object.
+    """
+    if not input:
+        input = '-'
+    with click.open_file(input, mode='rb') as f:
+        with map_file(f) as buf:
+            yield buf
+
+
+def iter_chunks(input=None, chunk_size=CHUNK_SIZE):
+    """
+    Reads an input file (or stdin) as a sequence of chunks.
+
+    Regular files are read via a memory map. Other inputs (e.g. stdin, pipes) are read chunk by chunk,
+    so the content is never held in memory all at once.
+
+    :param input: the path to the input file. Or '-' (or None) to use stdin.
+    :param chunk_size: the (maximum) size of each chunk.
+    :return: an iterable of bytes objects.
+    """
+    if not input:
+        input = '-'
+    with click.open_file(input, mode='rb') as f:
+        if is_regular_file(f) and os.fstat(f.fileno()).st_size:
+            with map_file(f) as buf:
+                for chunk in iter_buffer_chunks(buf, chunk_size):
+                    yield chunk
+        else:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                yield chunk
+
+
+def iter_text_chunks(input=None, chunk_size=CHUNK_SIZE, encoding='utf-8'):
+    """
+    Same as iter_chunks(), except that the chunks are decoded (on py3).
+
+    Multi-byte chars which span chunk boundaries are decoded incrementally.
+    On py2, the chunks are returned as they are (i.e. as str).
+
+    :param input: the path to the input file. Or '-' (or None) to use stdin.
+    :param chunk_size: the (maximum) size of each chunk.
+    :param encoding: the encoding of the input.
+    :return: an iterable of strings.
+    """
+    chunks = iter_chunks(input, chunk_size)
+    if PY2:
+        return chunks
+    return codecs.iterdecode(chunks, encoding)
+
+
+def iter_buffer_chunks(buf, chunk_size=CHUNK_SIZE, start=0, end=None):
+    """
+    Splits (a range of) a buffer into a sequence of chunks.
+
+    :param buf: a <mmap.mmap> or bytes object.
+    :param chunk_size: the (maximum) size of each chunk.
+    :param start: the start of the range.
+    :param end: the end of the range. Defaults to the end of the buffer.
+    :return: an iterable of bytes objects.
+
+    >>> list(iter_buffer_chunks(b'abcde', 2))
+    ['ab', 'cd', 'e']
+
+    >>> list(iter_buffer_chunks(b'abcde', 2, start=1, end=4))
+    ['bc', 'd']
+    """
+    if end is None:
+        end = len(buf)
+    for i in range(start, end, chunk_size):
+        yield buf[i:min(i + chunk_size, end)]
+
+
+def split_ranges(buf, count):
+    """
+    Divides a buffer into (up to) count ranges of roughly equal size, aligned on whitespace.
+
+    Each range (but the first) starts at a whitespace char, so no (whitespace delimited) token spans 2 ranges.
+    I.e. the ranges can be processed independently (e.g. in parallel), and the results merged.
+
+    :param buf: a <mmap.mmap> or bytes object.
+    :param count: the (maximum) number of ranges.
+    :return: a list of (start, end) tuples. Fewer than count if the buffer has too little whitespace.
+
+    >>> split_ranges(b'ab cd ef gh', 3)
+    [(0, 5), (5, 8), (8, 11)]
+
+    >>> split_ranges(b'abcdefgh', 3), split_ranges(b'', 3)
+    ([(0, 8)], [])
+    """
+    size = len(buf)
+    ranges = []
+    start = 0
+    for i in range(1, count):
+        if start >= size:
+            break
+        m = _WHITESPACE.search(buf, max(start + 1, size * i // count))
+        if not m:
+            break
+        ranges.append((start, m.start()))
+        start = m.start()
+    if start < size:
+        ranges.append((start, size))
+    return ranges
+
+
+def as_file(buf):
+    """
+    Provides a file-like object for a buffer (see open_buffer()), positioned at the start of the content.
+
+    :param buf: a <mmap.mmap> or bytes object.
+    :return: a file-like object.
+
+    >>> as_file(b'abc').read()
+    'abc'
+    """
+    if hasattr(buf, 'seek'):
+        buf.seek(0)
+        return buf
+    return BytesIO(buf)
+
+
+def strip_bounds(buf):
+    """
+    Determines the bounds of a buffer's content once leading and trailing whitespace is ignored.
+
+    :param buf: a <mmap.mmap> or bytes object.
+    :return: a (start, end) tuple, such that buf[start:end] == buf.strip().
+
+    >>> strip_bounds(b' a b\\n')
+    (1, 4)
+
+    >>> strip_bounds(b' \\n ')
+    (3, 3)
+    """
+    end = len(buf)
+    m = _WHITESPACE_TOKEN.search(buf)
+    if not m:
+        return end, end
+    while buf[end - 1:end].isspace():
+        end -= 1
+    return m.start(), end
+
+
+def iter_split_chunks(chunks, separator):
+    """
+    Splits a sequence of chunks (e.g. see iter_chunks()) on a separator, as the chunks are read.
+
+    The results are the same as those of b''.join(chunks).split(separator), but only the current chunk
+    (plus the piece carried over from the previous chunks) is held in memory.
+    Separators which span chunk boundaries are handled.
+
+    :param chunks: an iterable of bytes objects.
+    :param separator: the separator.
+    :return: an iterable of bytes objects.
+
+    >>> list(iter_split_chunks([b'a,', b'b,,c', b'd,'], b','))
+    ['a', 'b', '', 'cd', '']
+
+    >>> list(iter_split_chunks([b'a<', b'>b<>', b'<', b'>'], b'<>')), list(iter_split_chunks([], b','))
+    (['a', 'b', '', ''], [''])
+    """
+    if not separator:
+        raise ValueError('empty separator')
+    overlap = len(separator) - 1
+    # the parts of the (incomplete) piece carried over from the previous chunks
+    parts = []
+    # the end of the carried content (i.e. where a separator may start, and continue in the next chunk)
+    tail = b''
+    for chunk in chunks:
+        parts.append(chunk)
+        if separator in chunk or (overlap and separator in tail + chunk[:overlap]):
+            # Note: the carried parts are only joined once a separator completes the piece
+            pieces = b''.join(parts).split(separator)
+            parts = [pieces.pop()]
+            for piece in pieces:
+                yield piece
+        if overlap:
+            tail = (tail + chunk)[-overlap:]
+    yield b''.join(parts)
+
+
+def iter_split(buf, separator=None, start=0, end=None):
+    """
+    Splits (a range of) a buffer, without copying anything but the resulting pieces.
+
+    The results are the same as those of bytes.split() (i.e. buf[start:end].split(separator)).
+
+    :param buf: a <mmap.mmap> or bytes object.
+    :param separator: the separator. If None, runs of whitespace are used (and empty pieces are omitted).
+    :param start: the start of the range.
+    :param end: the end of the range. Defaults to the end of the buffer.
+    :return: an iterable of bytes objects.
+
+    >>> list(iter_split(b' a  b\\nc '))
+    ['a', 'b', 'c']
+
+    >>> list(iter_split(b'a,,b,', b','))
+    ['a', '', 'b', '']
+
+    >>> list(iter_split(b'a,b', b',')) == b'a,b'.split(b','), list(iter_split(b'', b',')) == b''.split(b',')
+    (True, True)
+    """
+    if end is None:
+        end = len(buf)
+    if separator is None:
+        for m in _WHITESPACE_TOKEN.finditer(buf, start, end):
+            yield m.group()
+        return
+    if not separator:
+        raise ValueError('empty separator')
+
+    i = start
+    while True:
+        j = buf.find(separator, i, end)
+        if j < 0:
+            yield buf[i:end]
+            return
+        yield buf[i:j]
+        i = j + len(separator)
+
+
+def iter_lines(input=None):
+    """
+    Reads an input file (or stdin) line by line (i.e. as the lines arrive, for piped input).
+
+    :param input: the path to the input file. Or '-' (or None) to use stdin.
+    :return: an iterable of bytes objects (i.e. the lines, including their line endings).
+    """
+    if not input:
+        input = '-'
+    with click.open_file(input, mode='rb') as f:
+        for line in iter(f.readline, b''):
+            yield line
+
+
+def strip_lines(lines):
+    """
+    Strips leading and trailing whitespace from a sequence of lines, as a whole, while streaming the lines.
+
+    The results are the same as those of ''.join(lines).strip().split('\\n'),
+    but only the (whitespace-only) lines which may turn out to be trailing whitespace are buffered.
+
+    :param lines: an iterable of strings (e.g. see iter_lines()).
+    :return: an iterable of strings (i.e. the lines, without the '\\n' line endings).
+
+    >>> list(strip_lines([' \\n', ' a \\n', '\\n', 'b\\r\\n', ' \\n']))
+    ['a ', '', 'b']
+
+    >>> list(strip_lines(['a\\n', ' \\n'])), list(strip_lines([' \\n']))
+    (['a'], [''])
+    """
+    held = None
+    blanks = []
+    for line in lines:
+        if line.endswith(b'\n'):
+            line = line[:-1]
+        if not line.strip():
+            if held is not None:
+                blanks.append(line)
+            continue
+        if held is None:
+            line = line.lstrip()
+        else:
+            yield held
+            for blank in blanks:
+                yield blank
+            blanks = []
+        held = line
+    yield held.rstrip() if held is not None else b''
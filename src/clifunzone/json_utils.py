@@ -1,5 +1,183 @@
+import codecs
 import json
+import os
+import re
 from collections import OrderedDict
+from importlib import import_module
+from json.decoder import py_scanstring
+from json.scanner import py_make_scanner
+from numbers import Number
+
+from six import PY2
+
+# the environment variable which (optionally) selects the JSON backend (see get_backend())
+BACKEND_ENV_VAR = 'CLIFUNZONE_JSON_BACKEND'
+
+# the size of the chunks that are read (from a file) by the incremental parser (see iterload_root_items())
+CHUNK_SIZE = 65536
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# the chars which can continue a number (e.g. '1' may be the start of '1e+10')
+_NUMBER_CHARS = re.compile(r'[\deE.+\-]*')
+
+# the chars which may follow the position of a decoding error caused by a truncated value
+# (e.g. the error is at the end of the buffer, or at the start of a truncated number or literal, e.g. 'tru')
+_TRUNCATED_TAIL = re.compile(r'[ \t\n\r]*[\w.+\-]*')
+
+# the decoding errors (i.e. messages) of a string which runs to the end of the buffer
+# (Note: their position is the start of the string, e.g. py2's scanstring reports 'end is out of bounds' for a string
+# which starts at the end of the buffer)
+_TRUNCATED_STRING_ERRORS = ('Unterminated string', 'end is out of bounds')
+
+# the position in a decoding error message (e.g. 'Expecting object: line 1 column 5 (char 4)')
+_ERROR_POSITION = re.compile(r'\(char (\d+)\)')
+
+
+class JSONBackend(object):
+    """
+    A JSON encoder/decoder implementation, i.e. a module with a json (stdlib) compatible API.
+
+    A backend is only used for the operations (i.e. encoding and/or decoding) for which its results are identical
+    to those of the stdlib json module (e.g. the same key order, separators, indentation, and float formatting).
+    The stdlib json module is used for the others.
+    """
+
+    def __init__(self, name, module, encoder=True, decoder=True):
+        """
+        :param name: the name of the backend.
+        :param module: the (json compatible) module.
+        :param encoder: If True, the backend is used for encoding (e.g. dumps()).
+        :param decoder: If True, the backend is used for decoding (e.g. loads()).
+        """
+        self.name = name
+        self.module = module
+        self.encoder = module if encoder else json
+        self.decoder = module if decoder else json
+
+    def __repr__(self):
+        return '<JSONBackend %s>' % self.name
+
+
+# the candidate backends (module name, encoder, decoder), in order of preference.
+# Note: On py2, simplejson decodes ASCII strings as str (rather than unicode), so it is only used for encoding.
+# Backends that cannot reproduce the stdlib output (e.g. orjson and ujson, which have fixed separators and
+# indentation, and their own float formatting) are intentionally not candidates.
+BACKEND_CANDIDATES = [
+    ('simplejson', True, not PY2),
+    ('json', True, True),
+]
+
+_backends = {}
+
+
+def get_backends():
+    """
+    Provides the available (i.e. installed) backends.
+
+    :return: a <collections.OrderedDict> of <JSONBackend> instances (by name), in order of preference.
+
+    >>> 'json' in get_backends()
+    True
+    """
+    backends = OrderedDict()
+    for name, encoder, decoder in BACKEND_CANDIDATES:
+        try:
+            module = import_module(name)
+        except ImportError:
+            continue
+        backends[name] = JSONBackend(name, module, encoder=encoder, decoder=decoder)
+    return backends
+
+
+def get_backend():
+    """
+    Provides the current backend.
+
+    Unless a backend has been selected via set_backend() (or the CLIFUNZONE_JSON_BACKEND environment variable),
+    the preferred available backend is used.
+
+    :return: a <JSONBackend> instance.
+    """
+    if 'current' not in _backends:
+        set_backend(os.environ.get(BACKEND_ENV_VAR) or None)
+    return _backends['current']
+
+
+def set_backend(name=None):
+    """
+    Selects the backend.
+
+    :param name: the name of an available backend (see get_backends()). Or None to select the preferred backend.
+    :return: the selected <JSONBackend> instance.
+
+    >>> set_backend('json')
+    <JSONBackend json>
+
+    >>> set_backend('no-such-backend')
+    Traceback (most recent call last):
+    ValueError: unknown (or unavailable) JSON backend: no-such-backend
+
+    >>> backend = set_backend()
+    """
+    backends = get_backends()
+    if name is None:
+        backend = next(iter(backends.values()))
+    elif name in backends:
+        backend = backends[name]
+    else:
+        raise ValueError('unknown (or unavailable) JSON backend: %s' % name)
+    _backends['current'] = backend
+    return backend
+
+
+def get_default_separators(indent=None):
+    """
+    Provides the separators that (the stdlib) json.dumps() uses by default.
+
+    :param indent: the indent.
+    :return: an (item separator, key separator) tuple.
+
+    >>> get_default_separators()
+    (', ', ': ')
+    """
+    encoder = json.JSONEncoder(indent=indent)
+    return encoder.item_separator, encoder.key_separator
+
+
+def dumps(obj, skipkeys=False, ensure_ascii=True, check_circular=True, allow_nan=True, indent=None, separators=None,
+          sort_keys=False, **kwargs):
+    """
+    Same as json.dumps(), except that the current backend (see get_backend()) is used.
+
+    The args (and their defaults) are those of json.dumps(). They are passed to the backend explicitly,
+    since other backends may have different defaults (e.g. for the separators when indent is used).
+
+    >>> dumps({'a': [1, 2.5, None]}, indent=None, separators=(',', ':'))
+    '{"a":[1,2.5,null]}'
+    """
+    if separators is None:
+        separators = get_default_separators(indent)
+    return get_backend().encoder.dumps(obj, skipkeys=skipkeys, ensure_ascii=ensure_ascii,
+                                       check_circular=check_circular, allow_nan=allow_nan, indent=indent,
+                                       separators=separators, sort_keys=sort_keys, **kwargs)
+
+
+def load(fp, **kwargs):
+    """
+    Same as json.load(), except that the current backend (see get_backend()) is used.
+    """
+    return get_backend().decoder.load(fp, **kwargs)
+
+
+def loads(s, **kwargs):
+    """
+    Same as json.loads(), except that the current backend (see get_backend()) is used.
+
+    >>> loads('[1, 2.5, null]')
+    [1, 2.5, None]
+    """
+    return get_backend().decoder.loads(s, **kwargs)
 
 
 def contains_valid_json(obj):
@@ -29,10 +207,10 @@ def contains_valid_json(obj):
     try:
         try:
             # json_object = json.loads(obj.read())
-            json.load(obj)
+            load(obj)
         except AttributeError:
             # obj is not a file
-            json.loads(obj)
+            loads(obj)
     except ValueError:
         return False
     return True
@@ -42,7 +220,7 @@ def load_ordered(fp, **kwargs):
     """
     Convenience wrapper for json.load() that loads the JSON while preserving the original element ordering/sequence.
     """
-    return json.load(fp, object_pairs_hook=OrderedDict, **kwargs)
+    return load(fp, object_pairs_hook=OrderedDict, **kwargs)
 
 
 def loads_ordered(s, **kwargs):
@@ -55,7 +233,228 @@ def loads_ordered(s, **kwargs):
     >>> loads_ordered('{"constants": {"pi2": 3.14, "pi5": 3.14159}}')
     OrderedDict([(u'constants', OrderedDict([(u'pi2', 3.14), (u'pi5', 3.14159)]))])
     """
-    return json.loads(s, object_pairs_hook=OrderedDict, **kwargs)
+    return loads(s, object_pairs_hook=OrderedDict, **kwargs)
+
+
+class _IncrementalReader(object):
+    """
+    Incrementally decodes JSON values from a file, reading (and buffering) only as much of the file as is needed.
+
+    The buffer is trimmed as the values are consumed, so only the current (i.e. partially decoded) value is held.
+    """
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE, **kwargs):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = get_backend().decoder.JSONDecoder(**kwargs)
+        # Note: an incremental decoder handles multibyte chars that are split across chunks
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = u''
+        self.pos = 0
+        # the number of chars which have been discarded from the buffer (i.e. the buffer's position in the input)
+        self.offset = 0
+        self.eof = False
+
+    def read(self, size=None):
+        """
+        Appends the next chunk of the file to the buffer (discarding the consumed part of the buffer).
+
+        :param size: the size of the chunk. Defaults to chunk_size.
+        :return: False if the end of the file was reached, else True.
+        """
+        if self.eof:
+            return False
+        chunk = self.fp.read(size or self.chunk_size)
+        self.eof = not chunk
+        if not isinstance(chunk, type(u'')):
+            chunk = self.text_decoder.decode(chunk, final=self.eof)
+        self.buf = self.buf[self.pos:] + chunk
+        self.offset += self.pos
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Skips any whitespace and returns the next char, without consuming it.
+
+        :return: the next (non-whitespace) char. Or '' if the end of the file was reached.
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self.read():
+                return self.buf[self.pos:self.pos + 1]
+
+    def next_char(self, expected):
+        """
+        Consumes the next (non-whitespace) char, which must be one of the expected chars.
+
+        :param expected: a string of the expected chars.
+        :return: the char.
+        """
+        c = self.peek()
+        if not c or c not in expected:
+            raise ValueError('Expecting one of %r: char %d' % (str(expected), self.offset + self.pos))
+        self.pos += 1
+        return c
+
+    def is_truncated(self, value, end):
+        """
+        Indicates whether a decoded value may be incomplete, because it may continue beyond the buffer.
+
+        :param value: the decoded value.
+        :param end: the position (in the buffer) where the value ends.
+        :return: True if the value may be truncated, else False.
+        """
+        if end >= len(self.buf):
+            return True
+        if isinstance(value, Number) and not isinstance(value, bool):
+            # e.g. '1' (of '1e+10')
+            return _NUMBER_CHARS.match(self.buf, end).end() >= len(self.buf)
+        return False
+
+    def is_truncated_error(self, error):
+        """
+        Indicates whether a decoding error may be caused by the end of the buffer (i.e. a truncated value),
+        rather than by invalid JSON (for which reading more of the file would not help).
+
+        :param error: the ValueError raised when decoding the value (at pos).
+        :return: True if the error is at (or near) the end of the buffer, else False.
+        """
+        if getattr(error, 'pos', None) is None:
+            # e.g. the py2 json module, whose (C) scanner does not report the position of all errors
+            error = _redecode_error(self.buf, self.pos) or error
+        if str(error).startswith(_TRUNCATED_STRING_ERRORS):
+            return True
+        pos = getattr(error, 'pos', None)
+        if pos is None:
+            m = _ERROR_POSITION.search(str(error))
+            pos = int(m.group(1)) if m else self.pos
+        return _TRUNCATED_TAIL.match(self.buf, min(pos, len(self.buf))).end() >= len(self.buf)
+
+    def next_value(self):
+        """
+        Decodes (and consumes) the next value.
+
+        If the buffer ends within (or immediately after) the value, more of the file is read and the value is
+        decoded again, since the value may continue (e.g. a number) or be incomplete (e.g. a truncated object).
+        The amount that is read is doubled on each retry, so large values are not decoded over and over.
+        Other decoding errors (i.e. invalid JSON, before the end of the buffer) are raised immediately,
+        so the rest of the file is not read.
+
+        :return: the value.
+        """
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError as e:
+                if not self.is_truncated_error(e) or not self.read(size):
+                    raise
+            else:
+                if not self.is_truncated(value, end) or not self.read(size):
+                    self.pos = end
+                    return value
+            size *= 2
+
+
+def _redecode_error(s, idx):
+    """
+    Decodes an invalid JSON value with the (pure Python) json decoder, which reports the position of each error.
+
+    :param s: the string.
+    :param idx: the position of the value.
+    :return: the ValueError raised by the decoder. Or None if the value is valid.
+    """
+    decoder = json.JSONDecoder()
+    decoder.parse_string = py_scanstring
+    decoder.scan_once = py_make_scanner(decoder)
+    try:
+        decoder.raw_decode(s, idx)
+    except ValueError as e:
+        return e
+    return None
+
+
+def iterload_root_items(fp, chunk_size=CHUNK_SIZE, **kwargs):
+    """
+    Incrementally parses a JSON document whose (single) root element contains an array (e.g. {"root": [...]}),
+    without loading the whole document.
+
+    The root element's name is parsed immediately.
+    The array's items are parsed (and yielded) one by one, as they are read from the file, so only the current
+    item is held in memory. The rest of the document (after the array) is validated once the items are exhausted.
+
+    If the root element contains an object (rather than an array), the object's keys are yielded instead
+    (i.e. the same as iterating over the loaded object).
+
+    :param fp: a file-like object.
+    :param chunk_size: the size of the chunks that the file is read in.
+    :param kwargs: optional kwargs for json.JSONDecoder() (e.g. object_pairs_hook).
+    :return: a (root, items) tuple, where root is the root element's name, and items is an iterable of the items.
+
+    >>> from io import BytesIO
+    >>> root, items = iterload_root_items(BytesIO(b' {"root": [1, {"a": [2]}, "b"]} '), chunk_size=4)
+    >>> root, list(items)
+    (u'root', [1, {u'a': [2]}, u'b'])
+
+    >>> root, items = iterload_root_items(BytesIO(b'{"root": {"a": [1], "b": 2}}'))
+    >>> list(items)
+    [u'a', u'b']
+
+    >>> root, items = iterload_root_items(BytesIO(b'{"a": [], "b": []}'))
+    >>> list(items)
+    Traceback (most recent call last):
+    ValueError: the input must contain a single root element.
+    """
+    reader = _IncrementalReader(fp, chunk_size=chunk_size, **kwargs)
+    reader.next_char('{')
+    if reader.peek() != '"':
+        raise ValueError('the input must contain a single root element.')
+    root = reader.next_value()
+    reader.next_char(':')
+    if reader.peek() not in ('[', '{'):
+        raise ValueError('the root element must contain an array (or an object).')
+    close = ']' if reader.next_char('[{') == '[' else '}'
+
+    def items():
+        keys = set()
+        if reader.peek() == close:
+            reader.pos += 1
+        else:
+            while True:
+                if close == ']':
+                    yield reader.next_value()
+                else:
+                    if reader.peek() != '"':
+                        reader.next_char('"')
+                    key = reader.next_value()
+                    reader.next_char(':')
+                    # Note: the values are parsed (i.e. validated), but not retained
+                    reader.next_value()
+                    if key not in keys:
+                        keys.add(key)
+                        yield key
+                if reader.next_char(',' + close) == close:
+                    break
+        if reader.next_char(',}') == ',':
+            raise ValueError('the input must contain a single root element.')
+        if reader.peek():
+            raise ValueError('Extra data: char %d' % (reader.offset + reader.pos))
+
+    return root, items()
+
+
+def iterload_root_items_ordered(fp, **kwargs):
+    """
+    Same as iterload_root_items(), except that the items are loaded while preserving the original element ordering.
+
+    >>> from io import BytesIO
+    >>> root, items = iterload_root_items_ordered(BytesIO(b'{"root": [{"b": 1, "a": 2}]}'))
+    >>> list(items)
+    [OrderedDict([(u'b', 1), (u'a', 2)])]
+    """
+    return iterload_root_items(fp, object_pairs_hook=OrderedDict, **kwargs)
 
 
 def main():
@@ -1,14 +1,17 @@
-import json
 import logging
 import sys
 from pprint import pformat
 
 import click
+from six import PY2
+from six import string_types
 
 from clifunzone import click_utils
+from clifunzone import input_utils
 from clifunzone import json_utils
-from clifunzone.dict_utils import filter_none_values
+from clifunzone.dict_utils import Pipeline
 from clifunzone.dict_utils import flatten
+from clifunzone.dict_utils import unflatten
 from clifunzone.mustache_utils import render as mustache_render
 from clifunzone.reflection_utils import varsdict
 
@@ -33,15 +36,44 @@ def debug_context(**kwargs):
         click.echo('subcommand: %s' % subcommand)
 
 
-@click.group(context_settings=click_utils.CONTEXT_SETTINGS, invoke_without_command=True)
+@click.group(cls=click_utils.MultiInputGroup, context_settings=click_utils.CONTEXT_SETTINGS,
+             invoke_without_command=True)
 @click.version_option(version='1.0.0')
 @click.option('--debug/--silent', '-d/-s', 'debug', default=False)
 # @click.option('--debug', '-d', 'debug', flag_value=True, default=True)
 # @click.option('--silent', '-s', 'debug', flag_value=False)
-def cli(debug):
+@click.option('--inputs', '-I', multiple=True, type=click.STRING,
+              help='an input file, directory or glob pattern. may be repeated.'
+                   ' causes the subcommand to be run once per input file (see --jobs).')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=1,
+              help='the number of processes used to run the subcommand for multiple --inputs. Default is 1.')
+@click.option('--ndjson', is_flag=True, type=click.BOOL,
+              help='enables NDJSON mode: the input is read as (newline delimited) JSON records,'
+                   ' which the subcommand processes 1 at a time, outputting 1 result line per record.')
+@click.option('--skip-invalid', is_flag=True, type=click.BOOL,
+              help='in NDJSON mode, causes invalid records to be skipped (and counted) instead of failing.')
+def cli(debug, inputs, jobs, ndjson, skip_invalid):
     """
     Provides CLI commands for interacting with JSON data/files.
+
+    With --inputs, the subcommand is run once per input file (using up to --jobs parallel processes).
+    The output for each file is preceded by a '==> path <==' header (in input order),
+    and any per-file failures are reported in a summary at the end.
+
+    With --ndjson, the parse, info, format, flatten, unflatten and strip subcommands treat each (non-blank) input line
+    as a separate JSON record. The input is streamed, so memory use is bounded by the size of a record.
+    With --skip-invalid, invalid records are reported (on stderr) and skipped, followed by a summary.
+
+    Examples:
+
+        \b
+        $ python -mclifunzone.jsontool -I data/ -j 4 format -c
+
+        \b
+        $ python -mclifunzone.jsontool --ndjson --skip-invalid flatten -c -i records.ndjson
     """
+    if skip_invalid and not ndjson:
+        raise click.UsageError('--skip-invalid requires --ndjson')
     ctx = click.get_current_context()
     if debug:
         click_utils.echo_context(ctx)
@@ -60,6 +92,60 @@ def cli(debug):
         logging.exception('debug_context error')
 
 
+def is_ndjson():
+    """
+    Indicates whether the (global) NDJSON mode is enabled (see cli() and echo_records()).
+    """
+    ctx = click.get_current_context()
+    return bool(ctx.parent and ctx.parent.params.get('ndjson'))
+
+
+def echo_records(input, render):
+    """
+    Loads the JSON input, and outputs the rendered result.
+
+    In NDJSON mode (see cli()), each (non-blank) line of the input is instead loaded (and rendered) separately,
+    as the lines are read, and the results are output (1 line per record) via a buffered writer.
+
+    :param input: the path to the input file. Or '-' (or None) to use stdin.
+    :param render: a function which renders the loaded JSON (i.e. a record) as a string.
+        In NDJSON mode, the string should be a single line.
+        (Each record must be a JSON object. Otherwise, it is treated the same as invalid JSON.)
+    """
+    if not input:
+        input = '-'
+    if not is_ndjson():
+        with click.open_file(input, mode='rb') as f:
+            data = json_utils.load_ordered(f)
+        click.echo(render(data))
+        return
+
+    skip_invalid = click.get_current_context().parent.params.get('skip_invalid')
+    counts = {'records': 0, 'skipped': 0}
+
+    def lines():
+        for number, line in enumerate(input_utils.iter_lines(input), 1):
+            if not line.strip():
+                continue
+            try:
+                data = json_utils.loads_ordered(line)
+                if not isinstance(data, dict):
+                    raise ValueError('the record is not a JSON object')
+            except ValueError as e:
+                # i.e. an invalid record (Note: errors raised by render() are not caught)
+                if not skip_invalid:
+                    raise ValueError('invalid JSON record (line %d): %s' % (number, e))
+                counts['skipped'] += 1
+                click.echo('skipped: line %d: %s: %s' % (number, type(e).__name__, e), err=True)
+                continue
+            counts['records'] += 1
+            yield render(data) + '\n'
+
+    click_utils.echo_chunks(lines(), nl=False)
+    if skip_invalid:
+        click.echo('summary: %s records, %s skipped' % (counts['records'], counts['skipped']), err=True)
+
+
 @cli.command(short_help='echo the unparsed input')
 @click.option('--input', '-i', type=click.Path(exists=True, dir_okay=False, allow_dash=True),
               help="the path to the file containing the input. Or '-' to use stdin (e.g. piped input).")
@@ -67,11 +153,7 @@ def echo(input, **kwargs):
     """
     Echo the (unparsed) input.
     """
-    if not input:
-        input = '-'
-    with click.open_file(input, mode='rb') as f:
-        s = f.read()
-        click.echo(s)
+    click_utils.echo_chunks(input_utils.iter_chunks(input))
 
 
 @cli.command(name='repr', short_help='show the repr() of the parsed input')
@@ -127,15 +209,15 @@ def parse(input, pyformat, sort_keys, **kwargs):
     """
     Converts the input into a structured object hierarchy. Requires valid input.
     """
-    if not input:
-        input = '-'
-    with click.open_file(input, mode='rb') as f:
-        d = json_utils.load_ordered(f)
+    indent = None if is_ndjson() else 2
+    width = sys.maxsize if is_ndjson() else 80
+
+    def render(d):
         if pyformat:
-            s = pformat(d)
-        else:
-            s = json.dumps(d, indent=2, sort_keys=sort_keys)
-        click.echo(s)
+            return pformat(d, width=width)
+        return json_utils.dumps(d, indent=indent, sort_keys=sort_keys)
+
+    echo_records(input, render)
 
 
 @cli.command()
@@ -149,10 +231,10 @@ def info(input, verbose, pyformat, **kwargs):
     """
     Provides info about the input. Requires valid input.
     """
-    if not input:
-        input = '-'
-    with click.open_file(input, mode='rb') as f:
-        data = json_utils.load_ordered(f)
+    indent = None if is_ndjson() else 2
+    width = sys.maxsize if is_ndjson() else 80
+
+    def render(data):
         d = {
             'length': len(data),
             'keys': sorted(data.keys())
@@ -168,31 +250,39 @@ def info(input, verbose, pyformat, **kwargs):
         # click.echo(d)
         # click.echo(sorted(d.items()))
         if pyformat:
-            s = pformat(d)
-        else:
-            s = json.dumps(d, indent=2, sort_keys=True)
-        click.echo(s)
+            return pformat(d, width=width)
+        return json_utils.dumps(d, indent=indent, sort_keys=True)
+
+    echo_records(input, render)
 
 
 @cli.command(short_help='merges JSON fragments under a single parent')
 @click.option('--input', '-i', type=click.Path(exists=True, dir_okay=False, allow_dash=True),
               help="the path to the file containing the input. Or '-' to use stdin (e.g. piped input).")
 @click.option('--root', '-r', default='root', help='the name of the new root element')
-def mergelines(input, root, **kwargs):
+@click.option('--validate', is_flag=True, type=click.BOOL,
+              help='causes each fragment to be validated (as it is merged).')
+def mergelines(input, root, validate, **kwargs):
     """
     Merges multiple (valid) JSON fragments into a single JSON.
 
     For piped input, each line is is assumed to be a separate json fragment.
+
+    The input is streamed (i.e. each line is output as it is read), so only 1 line is held in memory at a time.
     """
-    if not input:
-        input = '-'
-    with click.open_file(input, mode='rb') as f:
-        s = f.read()
-        s = s.strip()
-        lines = s.split('\n')
-        s = '{"%s": [\n%s\n]}' % (root, ',\n'.join(lines))
-        # data = json_utils.loads_ordered(s)
-        click.echo(s)
+    lines = input_utils.strip_lines(input_utils.iter_lines(input))
+
+    def chunks():
+        # Note: the lines are bytes, so the whole output is (i.e. the lines are passed through without decoding them)
+        yield ('{"%s": [\n' % root).encode('utf-8')
+        for i, line in enumerate(lines):
+            if validate and not json_utils.contains_valid_json(line):
+                raise ValueError('invalid JSON fragment (#%d): %s' % (i + 1, line if PY2 else line.decode('utf-8')))
+            yield b',\n' + line if i else line
+        yield b'\n]}'
+
+    # data = json_utils.loads_ordered(s)
+    click_utils.echo_chunks(chunks())
 
 
 @cli.command(name='format')
@@ -290,28 +380,40 @@ def formatcommand(input, style, indent, skip_keys, sort_keys, ensure_ascii, chec
     else:
         separators = None
 
-    if not input:
-        input = '-'
-    with click.open_file(input, mode='rb') as f:
-        # s = f.read()
-        # json_utils.loads_ordered(s)
-        data = json_utils.load_ordered(f)
-        if style == 'lines':
-            if len(data) != 1:
-                raise ValueError('"lines" style requires that the input must contain a single root element.')
-            root = data.keys()[0]
+    if style == 'lines':
+        if is_ndjson():
+            raise ValueError('"lines" style is not supported in NDJSON mode.')
+        if not input:
+            input = '-'
+        with click.open_file(input, mode='rb') as f:
+            # Note: the input is parsed incrementally (i.e. 1 child element at a time), so it can exceed the memory
+            try:
+                root, children = json_utils.iterload_root_items_ordered(f)
+            except ValueError as e:
+                raise ValueError('"lines" style requires that the input must contain a single root element: %s' % e)
             header = '{"%s": [\n' % root
             child_line_separator = '\n,\n'
             footer = ']}'  # '\n]}'
-            click.echo(header)
-            lines = [json.dumps(child, indent=None, separators=(',', ':')) for child in data[root]]
-            click.echo(child_line_separator.join(lines))
-            click.echo(footer)
-        else:
-            s = json.dumps(data, skipkeys=skip_keys, sort_keys=sort_keys,
-                           ensure_ascii=ensure_ascii, check_circular=check_circular,
-                           allow_nan=allow_nan, indent=indent, separators=separators)
-            click.echo(s)
+
+            def chunks():
+                yield header + '\n'
+                for i, child in enumerate(children):
+                    line = json_utils.dumps(child, indent=None, separators=(',', ':'))
+                    yield child_line_separator + line if i else line
+                yield '\n' + footer
+
+            click_utils.echo_chunks(chunks())
+        return
+
+    if is_ndjson():
+        indent = None
+
+    def render(data):
+        return json_utils.dumps(data, skipkeys=skip_keys, sort_keys=sort_keys,
+                                ensure_ascii=ensure_ascii, check_circular=check_circular,
+                                allow_nan=allow_nan, indent=indent, separators=separators)
+
+    echo_records(input, render)
 
 
 @cli.command(name='flatten', short_help='flattens deeply nested JSON input')
@@ -319,6 +421,8 @@ def formatcommand(input, style, indent, skip_keys, sort_keys, ensure_ascii, chec
               help="the path to the file containing the input."
                    " Or '-' to use stdin (e.g. piped input).")
 @click.option('--separator', '-s', type=click.STRING, help='the key/element separator. Default is "__".')
+@click.option('--null', '-n', 'prune_null', is_flag=True, type=click.BOOL,
+              help='removes elements with null values (before flattening).')
 @click.option('--sort-keys', '--sorted/--unsorted', '--sort', 'sort_keys', default=False,
               help='causes the keys of each element to be output in sorted order.')
 @click.option('--compact', '-c', 'style', flag_value='compact',
@@ -330,7 +434,7 @@ def formatcommand(input, style, indent, skip_keys, sort_keys, ensure_ascii, chec
 @click.option('--flat', '-f', 'style', flag_value='flat',
               help='output format style that generates multi-line, non-indented output.'
                    ' for more options, use the jsontool.format command.')
-def flattencommand(input, separator, sort_keys, style, **kwargs):
+def flattencommand(input, separator, prune_null, sort_keys, style, **kwargs):
     """
     Flattens JSON input with nested or hierarchical structure into a flat (depth 1) hierarchy. Requires valid input.
 
@@ -340,6 +444,11 @@ def flattencommand(input, separator, sort_keys, style, **kwargs):
         Example: Basic usage:
         $ echo '{"a":{"b":null,"c":"null","d":"","e":{"f":null},"g":{},"h":[]}}' | python -mclifunzone.jsontool flatten -c
         {"a__b":null,"a__c":"null","a__d":"","a__e__f":null,"a__h":[]}
+
+        \b
+        Example: Remove all elements with value=null (before flattening):
+        $ echo '{"a":{"b":null,"c":"null","d":"","e":{"f":null},"g":{},"h":[]}}' | python -mclifunzone.jsontool flatten -c -n
+        {"a__c":"null","a__d":"","a__h":[]}
     """
     if style == 'compact':
         dumps_separators = (',', ':')
@@ -354,15 +463,74 @@ def flattencommand(input, separator, sort_keys, style, **kwargs):
         dumps_separators = None
         dumps_indent = None
 
-    if not input:
-        input = '-'
+    if is_ndjson():
+        dumps_indent = None
     if separator is None:
         separator = '__'
-    with click.open_file(input, mode='rb') as f:
-        data = json_utils.load_ordered(f)
+
+    pipeline = Pipeline()
+    if prune_null:
+        pipeline.filter_none_values()
+
+    def render(data):
+        data = pipeline.apply(data)
         data = flatten(data, separator)
-        s = json.dumps(data, indent=dumps_indent, separators=dumps_separators, sort_keys=sort_keys)
-        click.echo(s)
+        return json_utils.dumps(data, indent=dumps_indent, separators=dumps_separators, sort_keys=sort_keys)
+
+    echo_records(input, render)
+
+
+@cli.command(name='unflatten', short_help='restores the nested structure of flattened JSON input')
+@click.option('--input', '-i', type=click.Path(exists=True, dir_okay=False, allow_dash=True),
+              help="the path to the file containing the input."
+                   " Or '-' to use stdin (e.g. piped input).")
+@click.option('--separator', '-s', type=click.STRING, help='the key/element separator. Default is "__".')
+@click.option('--sort-keys', '--sorted/--unsorted', '--sort', 'sort_keys', default=False,
+              help='causes the keys of each element to be output in sorted order.')
+@click.option('--compact', '-c', 'style', flag_value='compact',
+              help='output format style that minimizes the output.'
+                   ' for more options, use the jsontool.format command.')
+@click.option('--pretty', '-p', 'style', flag_value='pretty',
+              help='output format style that generates human readable output.'
+                   ' for more options, use the jsontool.format command.')
+@click.option('--flat', '-f', 'style', flag_value='flat',
+              help='output format style that generates multi-line, non-indented output.'
+                   ' for more options, use the jsontool.format command.')
+def unflattencommand(input, separator, sort_keys, style, **kwargs):
+    """
+    Restores the nested structure of flattened JSON input (i.e. the inverse of the flatten command).
+    Requires valid input.
+
+    Examples:
+
+        \b
+        Example: Basic usage:
+        $ echo '{"a__b":null,"a__c":"null","a__e__f":null,"g":[]}' | python -mclifunzone.jsontool unflatten -c
+        {"a":{"b":null,"c":"null","e":{"f":null}},"g":[]}
+    """
+    if style == 'compact':
+        dumps_separators = (',', ':')
+        dumps_indent = None
+    elif style == 'pretty':
+        dumps_separators = None
+        dumps_indent = 2
+    elif style == 'flat':
+        dumps_separators = (',', ': ')
+        dumps_indent = 0
+    else:
+        dumps_separators = None
+        dumps_indent = None
+
+    if is_ndjson():
+        dumps_indent = None
+    if separator is None:
+        separator = '__'
+
+    def render(data):
+        data = unflatten(data, separator)
+        return json_utils.dumps(data, indent=dumps_indent, separators=dumps_separators, sort_keys=sort_keys)
+
+    echo_records(input, render)
 
 
 @cli.command(short_help='removes portions of the input')
@@ -371,10 +539,10 @@ def flattencommand(input, separator, sort_keys, style, **kwargs):
                    " Or '-' to use stdin (e.g. piped input).")
 @click.option('--null', '-n', 'prune_null', is_flag=True, type=click.BOOL,
               help='removes elements with null values.')
-# @click.option('--empty', '-e', 'prune_empty', is_flag=True, type=click.BOOL, default=True,
-#               help='removes elements with empty values.')
-# @click.option('--trim', '-t', 'trim', type=click.BOOL,
-#               help='trims leading and trailing whitespace from all string values.')
+@click.option('--empty', '-e', 'prune_empty', is_flag=True, type=click.BOOL,
+              help='removes elements with empty values (i.e. empty strings, arrays and objects).')
+@click.option('--trim', '-t', 'trim', is_flag=True, type=click.BOOL,
+              help='trims leading and trailing whitespace from all string values.')
 @click.option('--compact', '-c', 'style', flag_value='compact',
               help='output format style that minimizes the output.'
                    ' for more options, use the jsontool.format command.')
@@ -384,16 +552,24 @@ def flattencommand(input, separator, sort_keys, style, **kwargs):
 @click.option('--flat', '-f', 'style', flag_value='flat',
               help='output format style that generates multi-line, non-indented output.'
                    ' for more options, use the jsontool.format command.')
-def strip(input, prune_null, style, **kwargs):
+def strip(input, prune_null, prune_empty, trim, style, **kwargs):
     """
     Removes specified portions of data from the input. Requires valid input.
 
+    The options are combined into a single pass over the input (trimming first, then removing
+    null values, then empty values, so that e.g. objects which only contain null values are removed with -n -e).
+
     Examples:
 
         \b
         Example: Remove all elements with value=null:
         $ echo '{"a":{"b":null,"c":"null","d":"","e":{"f":null},"g":{},"h":[]}}' | python -mclifunzone.jsontool strip -n
         {"a": {"c": "null", "d": "", "e": {}, "g": {}, "h": []}}
+
+        \b
+        Example: Remove all elements with null or empty values:
+        $ echo '{"a":{"b":null,"c":"null","d":"","e":{"f":null},"g":{},"h":[]}}' | python -mclifunzone.jsontool strip -n -e
+        {"a": {"c": "null"}}
     """
     if style == 'compact':
         dumps_separators = (',', ':')
@@ -408,14 +584,22 @@ def strip(input, prune_null, style, **kwargs):
         dumps_separators = None
         dumps_indent = None
 
-    if not input:
-        input = '-'
-    with click.open_file(input, mode='rb') as f:
-        data = json_utils.load_ordered(f)
-        if prune_null:
-            data = filter_none_values(data, recursive=True)
-        s = json.dumps(data, indent=dumps_indent, separators=dumps_separators)
-        click.echo(s)
+    if is_ndjson():
+        dumps_indent = None
+
+    pipeline = Pipeline()
+    if trim:
+        pipeline.map_values(lambda v: v.strip() if isinstance(v, string_types) else v)
+    if prune_null:
+        pipeline.filter_none_values()
+    if prune_empty:
+        pipeline.remove_if(lambda k, v: v in ('', [], {}))
+
+    def render(data):
+        data = pipeline.apply(data)
+        return json_utils.dumps(data, indent=dumps_indent, separators=dumps_separators)
+
+    echo_records(input, render)
 
 
 @cli.command(short_help='renders a mustache template using JSON input')
@@ -463,7 +647,7 @@ def mustache(input, tf, ts):
         input = '-'
     with click.open_file(input, mode='rb') as f:
         # data = json_utils.load_ordered(f)
-        data = json.load(f)
+        data = json_utils.load(f)
     output = mustache_render(ts, **data)
     click.echo(output)
 
@@ -0,0 +1,169 @@
+from abc import ABCMeta
+from abc import abstractmethod
+from collections import Counter
+
+from six import add_metaclass
+
+__all__ = ['Metric', 'CountMetric', 'CounterMetric', 'ListMetric', 'MetricsCollector']
+
+
+@add_metaclass(ABCMeta)
+class Metric(object):
+    """
+    A metric, which is computed from the nodes (e.g. of an object hierarchy) visited during a walk
+    (see <MetricsCollector>).
+
+    Each metric registers interest in certain node types, and is only updated with the nodes of those types.
+    Subclasses implement visit() and result().
+    """
+
+    def __init__(self, types=None, func=None):
+        """
+        :param types: the node types of interest (e.g. ['Step']). Or None for all the nodes (i.e. of any type).
+        :param func: an (optional) function which extracts the relevant value from a node.
+            Defaults to the node itself.
+        """
+        self.types = None if types is None else frozenset(types)
+        self.func = func
+
+    def extract(self, node):
+        return self.func(node) if self.func else node
+
+    @abstractmethod
+    def visit(self, node):
+        """
+        Updates the metric with a node (of interest).
+        """
+
+    @abstractmethod
+    def result(self):
+        """
+        :return: the value of the metric (i.e. for the nodes visited so far).
+        """
+
+
+class CountMetric(Metric):
+    """
+    Counts the nodes of interest.
+
+    >>> metric = CountMetric(); metric.visit('a'); metric.visit('b'); metric.result()
+    2
+    """
+
+    def __init__(self, types=None):
+        super(CountMetric, self).__init__(types)
+        self.count = 0
+
+    def visit(self, node):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+
+class CounterMetric(Metric):
+    """
+    Counts the distinct values of the nodes of interest (None values are ignored).
+
+    >>> metric = CounterMetric(func=len); metric.visit('a'); metric.visit('b'); metric.visit('cd'); metric.result()
+    Counter({1: 2, 2: 1})
+    """
+
+    def __init__(self, types=None, func=None):
+        super(CounterMetric, self).__init__(types, func)
+        self.counter = Counter()
+
+    def visit(self, node):
+        value = self.extract(node)
+        if value is not None:
+            self.counter[value] += 1
+
+    def result(self):
+        return self.counter
+
+
+class ListMetric(Metric):
+    """
+    Lists the values of the nodes of interest (in the order that they are visited).
+
+    >>> metric = ListMetric(func=str.upper); metric.visit('a'); metric.visit('b'); metric.result()
+    ['A', 'B']
+    """
+
+    def __init__(self, types=None, func=None):
+        super(ListMetric, self).__init__(types, func)
+        self.values = []
+
+    def visit(self, node):
+        self.values.append(self.extract(node))
+
+    def result(self):
+        return self.values
+
+
+class MetricsCollector(object):
+    """
+    Computes a set of metrics in a single walk (i.e. a visitor).
+
+    Each node is dispatched (by its type) to the metrics interested in that type only,
+    so any number of metrics can be computed without walking the nodes again (or testing every node for every metric).
+
+    E.g. Nodes can be provided by walk_items.iter_walk() (for nested dicts) or Element.iter() (for XML elements).
+
+    >>> from collections import OrderedDict
+    >>> collector = MetricsCollector(OrderedDict([('all', CountMetric()), ('b', ListMetric(['b'], lambda n: n[1]))]),
+    ...                              node_type=lambda n: n[0])
+    >>> collector.collect([('a', 1), ('b', 2), ('c', 3), ('b', 4)])
+    OrderedDict([('all', 4), ('b', [2, 4])])
+    """
+
+    def __init__(self, metrics, node_type=None):
+        """
+        :param metrics: a dict of <Metric> instances (by name).
+        :param node_type: a function which provides the type of a node.
+            Only required if any of the metrics are interested in specific node types.
+        """
+        self.metrics = metrics
+        self.node_type = node_type
+        self._any_type = [metric for metric in metrics.values() if metric.types is None]
+        self._by_type = {}
+        for metric in metrics.values():
+            for node_type in metric.types or ():
+                self._by_type.setdefault(node_type, []).append(metric)
+
+    def visit(self, node):
+        """
+        Updates the metrics (which are interested in the type of the node) with a node.
+        """
+        for metric in self._any_type:
+            metric.visit(node)
+        if self._by_type:
+            for metric in self._by_type.get(self.node_type(node), ()):
+                metric.visit(node)
+
+    def collect(self, nodes):
+        """
+        Visits a sequence of nodes.
+
+        :param nodes: an iterable of nodes.
+        :return: the results (see results()).
+        """
+        for node in nodes:
+            self.visit(node)
+        return self.results()
+
+    def results(self):
+        """
+        :return: a dict (of the same type as the metrics dict) of the metric values (by name).
+        """
+        return type(self.metrics)((name, metric.result()) for name, metric in self.metrics.items())
+
+
+def main():
+    import doctest
+    fail, total = doctest.testmod(optionflags=(doctest.REPORT_NDIFF | doctest.REPORT_ONLY_FIRST_FAILURE))
+    print('Doctest: {f} FAILED ({p} of {t} PASSED).'.format(f=fail, p=(total - fail), t=total))
+
+
+if __name__ == "__main__":
+    main()
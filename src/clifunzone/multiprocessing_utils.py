@@ -1,5 +1,6 @@
 import logging
 import random
+from multiprocessing import Pool
 from multiprocessing import Process
 from time import sleep as time_sleep
 
@@ -28,6 +29,40 @@ def run_processes(processes):
     log.info('Processes: Done.')
 
 
+def imap_processes(func, iterable, processes=None):
+    """
+    Applies func to each item of iterable using a pool of worker processes.
+
+    The results are yielded in the same order as the items (as soon as each result is available).
+
+    :param func: a picklable (e.g. module-level) function which accepts a single (picklable) item.
+    :param iterable: the items.
+    :param processes: the number of worker processes. Defaults to the number of CPUs.
+        If 1 (or less), the items are processed sequentially within the current process (i.e. without a pool).
+    :return: an iterable of the results.
+
+    >>> list(imap_processes(abs, [-1, 2, -3], processes=1))
+    [1, 2, 3]
+    """
+    if processes is not None and processes <= 1:
+        for item in iterable:
+            yield func(item)
+        return
+
+    log.info('Pool: Initializing: processes=%s' % processes)
+    pool = Pool(processes)
+    try:
+        for result in pool.imap(func, iterable):
+            yield result
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    log.info('Pool: Done.')
+
+
 def _simple__process_func(name, max_delay, exception_probability):
     log.debug('Process event: status={}; process={}'.format('start', name))
 
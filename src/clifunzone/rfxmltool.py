@@ -1,4 +1,3 @@
-import json
 import logging
 from collections import OrderedDict
 from pprint import pformat
@@ -6,7 +5,11 @@ from pprint import pformat
 import click
 
 from clifunzone import click_utils
+from clifunzone import input_utils
+from clifunzone import json_utils
 from clifunzone import xml_utils
+from clifunzone.metrics_utils import CountMetric
+from clifunzone.metrics_utils import MetricsCollector
 from clifunzone.reflection_utils import varsdict
 
 try:
@@ -65,6 +68,10 @@ def cli(debug):
     except:
         logging.exception('debug_context error')
 
+    if debug and subcommand is not None:
+        # report the XPath cache statistics once the subcommand has finished
+        ctx.call_on_close(lambda: click.echo('xpath cache: %s' % xml_utils.xpath_cache_info()))
+
 
 @cli.command(short_help='echo the unparsed input')
 @click.option('--input', '-i', type=click.Path(exists=True, dir_okay=False, allow_dash=True),
@@ -73,11 +80,7 @@ def echo(input, **kwargs):
     """
     Echo the (unparsed) input.
     """
-    if not input:
-        input = '-'
-    with click.open_file(input, mode='rb') as f:
-        s = f.read()
-        click.echo(s)
+    click_utils.echo_chunks(input_utils.iter_chunks(input))
 
 
 @cli.command()
@@ -100,11 +103,12 @@ def info(input, verbose, pyformat, **kwargs):
         d = {}
         d.update({'xml': xml_utils.element_info(root)})
 
-        rf_metrics = {
-            'suites': xml_utils.count_elements(tree, xpath='//suite'),
-            'tests': xml_utils.count_elements(tree, xpath='//test'),
-            'messages': xml_utils.count_elements(tree, xpath='//msg')
-        }
+        # all the metrics are computed in a single walk of the elements
+        rf_metrics = MetricsCollector({
+            'suites': CountMetric(['suite']),
+            'tests': CountMetric(['test']),
+            'messages': CountMetric(['msg'])
+        }, node_type=lambda element: element.tag).collect(root.iter())
         d.update({'robot': rf_metrics})
 
         if verbose:
@@ -120,7 +124,7 @@ def info(input, verbose, pyformat, **kwargs):
         if pyformat:
             s = pformat(d)
         else:
-            s = json.dumps(d, indent=2, sort_keys=True)
+            s = json_utils.dumps(d, indent=2, sort_keys=True)
         click.echo(s)
 
 
@@ -151,12 +155,12 @@ def keywords(input, start, stop, step, status, showargs, showmsgs, pretty, **kwa
             kws = [kw for kw in kws if kw['status']['status'] == status]
         kws = kws[start:stop:step]
         if pretty:
-            output = json.dumps(kws, indent=4)
+            output = json_utils.dumps(kws, indent=4)
             click.echo(output)
         else:
             # click.echo(json.dumps(kws))
             for kw in kws:
-                kw = json.dumps(kw)
+                kw = json_utils.dumps(kw)
                 click.echo(kw)
 
 
@@ -189,12 +193,12 @@ def testscommand(input, start, stop, step, status, showargs, showmsgs, pretty, *
                              test_element['status']['status'] == status]
         test_elements = test_elements[start:stop:step]
         if pretty:
-            output = json.dumps(test_elements, indent=4)
+            output = json_utils.dumps(test_elements, indent=4)
             click.echo(output)
         else:
             # click.echo(json.dumps(kws))
             for test_element in test_elements:
-                test_element = json.dumps(test_element)
+                test_element = json_utils.dumps(test_element)
                 click.echo(test_element)
 
 
@@ -1,10 +1,37 @@
-import itertools
+import codecs
+import hashlib
 import re
+import sys
+from array import array
 from collections import Counter
 from collections import OrderedDict
 
+from six import binary_type
+from six import int2byte
+
+from clifunzone import json_utils
 from clifunzone.reflection_utils import is_string
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# If True (and NumPy is installed), the chars of byte string chunks are counted via numpy.bincount() (see count_stream())
+NUMPY_CHAR_COUNTS = numpy is not None
+
+# the chars of byte strings, by byte value (i.e. as iterating a byte string yields them: str on py2, int on py3)
+_BYTE_CHARS = [int2byte(b)[0] for b in range(256)]
+
+# the maximum number of regex patterns which are combined into a single alternation (see get_matcher()).
+# I.e. 1 group per pattern, within the limit of 100 groups (including the implicit group 0) of the re module on py2.
+MAX_COMBINED_PATTERNS = 99
+
+TOKEN_INDEX_MAGIC = b'clifunzone.token_index.1\n'
+
+# the array type of the token positions (i.e. a 4-byte unsigned int, where available)
+TOKEN_INDEX_TYPECODE = 'I' if array('I').itemsize >= 4 else 'L'
+
 
 def lorem_ipsum():
     """
@@ -51,6 +78,113 @@ def get_info(s):
 
     :param s: a string.
     :return: a <collections.OrderedDict> instance.
+
+    >>> d = get_info('Lorem ipsum, lorem.')
+    >>> d['length'], d['metrics']['words']['counts']['each']
+    (19, OrderedDict([('ipsum', 1), ('lorem', 2)]))
+    """
+    return get_stream_info([s])
+
+
+def get_stream_info(chunks):
+    """
+    Same as get_info(), except that it processes a sequence of string chunks (e.g. from a file, read chunk by chunk).
+
+    The chunks are processed in a single pass (i.e. the chars and words are counted as each chunk is read),
+    so only the current chunk and the counts are held in memory.
+
+    :param chunks: an iterable of strings.
+    :return: a <collections.OrderedDict> instance.
+
+    >>> get_stream_info(['Lorem ips', 'um, lorem.']) == get_info('Lorem ipsum, lorem.')
+    True
+    """
+
+    chars, words = count_stream(chunks)
+    return get_counts_info(chars, words)
+
+
+def is_single_byte_encoding(encoding):
+    """
+    Determines whether an encoding maps each byte to a single char (e.g. latin-1 or cp1252, but not utf-8).
+
+    :param encoding: the name of the encoding.
+    :return: True if every byte value decodes (on its own) to exactly one char.
+
+    >>> is_single_byte_encoding('latin-1'), is_single_byte_encoding('cp1252'), is_single_byte_encoding('utf-8')
+    (True, True, False)
+    """
+    decoder = codecs.getincrementaldecoder(encoding)
+    # Note: a multibyte encoding buffers (rather than decodes) the lead byte of a multibyte char
+    return all(len(decoder(errors='replace').decode(int2byte(b))) == 1 for b in range(256))
+
+
+def count_stream(chunks, encoding=None):
+    """
+    Counts the chars and (lowercased) words of a sequence of string chunks in a single pass (see get_stream_info()).
+
+    The counts of separate sequences (e.g. of whitespace aligned ranges of a file) can be merged (via Counter.update())
+    and then passed to get_counts_info().
+
+    Byte string chunks are counted one byte per char, which is only correct for a single-byte encoding
+    (or for ASCII content). The chars of any other encoding (e.g. utf-8) are only counted correctly if the encoding
+    is given, in which case the chunks are decoded (incrementally) before their chars are counted.
+
+    If NumPy is installed (see NUMPY_CHAR_COUNTS), the chars of byte string chunks that are counted one byte per char
+    are counted as a histogram of the byte values (via numpy.bincount()), rather than one char at a time.
+    Decoded and text (i.e. unicode) chunks, which may contain multibyte chars, are always counted one char at a time.
+
+    :param chunks: an iterable of strings.
+    :param encoding: the encoding of byte string chunks. If None (or a single-byte encoding), each byte
+        is counted as a char.
+    :return: a (chars, words) tuple of <collections.Counter> instances. The chars are not lowercased.
+
+    >>> chars, words = count_stream(['Lorem ips', 'um, lorem.'])
+    >>> chars['L'], chars['l'], sorted(words.items())
+    (1, 1, [('ipsum', 1), ('lorem', 2)])
+
+    >>> chars, words = count_stream([b'caf\xc3', b'\xa9 caf\xc3\xa9'], encoding='utf-8')
+    >>> chars[u'\xe9'], len(chars)
+    (2, 5)
+    """
+    chars = Counter()
+    decoder = None
+    if encoding is not None and not is_single_byte_encoding(encoding):
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    # a histogram of byte values (i.e. for byte string chunks, if NumPy is used)
+    histogram = [] if NUMPY_CHAR_COUNTS and numpy is not None and decoder is None else None
+
+    def counted(chunks):
+        for chunk in chunks:
+            if decoder is not None and isinstance(chunk, binary_type):
+                chars.update(decoder.decode(chunk))
+            elif histogram is not None and isinstance(chunk, binary_type):
+                counts = numpy.bincount(numpy.frombuffer(chunk, dtype=numpy.uint8), minlength=256)
+                if histogram:
+                    histogram[0] += counts
+                else:
+                    histogram.append(counts)
+            else:
+                # e.g. (possibly multibyte) text
+                chars.update(chunk)
+            yield chunk
+
+    words = Counter(w.lower() for w in iter_words(counted(chunks)))
+    if decoder is not None:
+        chars.update(decoder.decode(b'', final=True))
+    if histogram:
+        for b in numpy.flatnonzero(histogram[0]):
+            chars[_BYTE_CHARS[b]] += int(histogram[0][b])
+    return chars, words
+
+
+def get_counts_info(chars, words):
+    """
+    Returns a dict with (incomplete) info about a string, given its char and word counts (see count_stream()).
+
+    :param chars: a <collections.Counter> of the chars.
+    :param words: a <collections.Counter> of the (lowercased) words.
+    :return: a <collections.OrderedDict> instance.
     """
 
     def get_distinct_tokens(tokens, ignore_case=False):
@@ -61,10 +195,9 @@ def get_info(s):
         tokens = set(tokens)
         return tokens
 
-    def get_tokens_info(tokens):
+    def get_tokens_info(ctr):
         d = {}
-        d.update({'total': len(tokens)})
-        ctr = Counter(tokens)
+        d.update({'total': sum(ctr.values())})
         d.update({'distinct': len(ctr.keys())})
         d.update({'each': OrderedDict(sorted(ctr.items()))})
         d = {'counts': d}
@@ -72,27 +205,21 @@ def get_info(s):
 
     d = OrderedDict()
 
-    d.update({'length': len(s)})
+    d.update({'length': sum(chars.values())})
 
-    if not s:
+    if not chars:
         return d
 
-    # d2 = {}
-    # d2.update({'words': (get_distinct_tokens(s.split(' ,.'), ignore_case=True))})
-    # d2.update({'sentences': (get_distinct_tokens(sentences, ignore_case=True))})
-    # d['content'] = d2
-
     d['metrics'] = {}
 
-    # get all chars
-    tokens = list(s)
-    tokens = [t.lower() for t in tokens]
-    d['metrics']['chars'] = get_tokens_info(tokens)
+    # get all chars (the distinct chars are lowercased once each, rather than each char of the input)
+    ctr = Counter()
+    for c, count in chars.items():
+        ctr[c.lower()] += count
+    d['metrics']['chars'] = get_tokens_info(ctr)
 
     # get all words
-    tokens = get_words(s)
-    tokens = [t.lower() for t in tokens]
-    d['metrics']['words'] = get_tokens_info(tokens)
+    d['metrics']['words'] = get_tokens_info(words)
 
     # # get all words
     # tokens = get_words(s)
@@ -138,6 +265,59 @@ def get_words(s):
     return words
 
 
+def iter_tokens(chunks, pattern=r'\S+'):
+    """
+    Splits a sequence of string chunks (e.g. from a file, read chunk by chunk) into an iterable of tokens.
+
+    Tokens which span chunk boundaries are handled, so the results do not depend on the chunk size.
+    Only the current chunk (plus any partial token carried over from the previous chunk) is held in memory.
+
+    :param chunks: an iterable of strings.
+    :param pattern: the regex pattern which matches a token. Default is any run of non-whitespace chars.
+    :return: an iterable of tokens.
+
+    >>> list(iter_tokens(['Lorem ips', 'um  dol', 'or', ' sit']))
+    ['Lorem', 'ipsum', 'dolor', 'sit']
+    """
+    regex = None
+    carry = None
+    for chunk in chunks:
+        if regex is None:
+            # i.e. byte string chunks are matched against a byte string pattern (on py3)
+            if isinstance(chunk, binary_type) and not isinstance(pattern, binary_type):
+                pattern = pattern.encode('ascii')
+            regex = re.compile(pattern)
+        if carry:
+            chunk = carry + chunk
+        carry = None
+        last = None
+        for m in regex.finditer(chunk):
+            if last:
+                yield last.group()
+            last = m
+        if last:
+            if last.end() == len(chunk):
+                # the token may continue in the next chunk
+                carry = chunk[last.start():]
+            else:
+                yield last.group()
+    if carry:
+        yield carry
+
+
+def iter_words(chunks):
+    """
+    Same as get_words(), except that it splits a sequence of string chunks (see iter_tokens()).
+
+    :param chunks: an iterable of strings.
+    :return: an iterable of words.
+
+    >>> list(iter_words(["Hi! My name is Anne-Ma", "rie. What's yours?"]))
+    ['Hi', 'My', 'name', 'is', 'Anne-Marie', "What's", 'yours']
+    """
+    return iter_tokens(chunks, pattern=r"[\w'\-]+")
+
+
 def get_sentences(s):
     raise NotImplementedError()
     # pattern = r"[^.!?]*[.!?]"
@@ -185,6 +365,64 @@ def find_all(item, items, regex=False, regex_flags=None):
         return [(index, value) for index, value in enumerate(items) if value == item]
 
 
+def get_matcher(values, regex=False, regex_flags=None):
+    """
+    Creates a function which finds which one (if any) of a given sequence of values (or patterns) matches an item.
+
+    Literal values are matched using a (hashed) dict lookup. Regex patterns are compiled (once) into a single
+    'tagged' alternation (i.e. one named group per pattern), so that each item is searched just once
+    (rather than once per pattern). Patterns which cannot be safely combined (i.e. those with their own groups
+    or with inline flags) are searched individually. Many patterns are combined in batches (see MAX_COMBINED_PATTERNS).
+
+    :param values: a sequence of values (or patterns) to match.
+    :param regex: If True, the values will be treated as regex patterns.
+    :param regex_flags: Optional flags for re.search().
+    :return: a function which accepts an item, and returns the index (within values) of a matching value.
+        Or None if none of the values match the item.
+
+    >>> matcher = get_matcher(['own', 'cow', 'own'])
+    >>> [matcher(w) for w in ['How', 'cow', 'own']]
+    [None, 1, 0]
+
+    >>> matcher = get_matcher(['^b', 'ow$'], regex=True)
+    >>> [matcher(w) for w in ['How', 'brown', 'owl']]
+    [1, 0, None]
+
+    >>> matcher = get_matcher([r'(o)\\1', '^h'], regex=True, regex_flags=re.IGNORECASE)
+    >>> [matcher(w) for w in ['How', 'now', 'cool']]
+    [1, None, 0]
+    """
+    if not regex:
+        lookup = {}
+        for i, value in enumerate(values):
+            lookup.setdefault(value, i)
+        return lookup.get
+
+    flags = regex_flags or 0
+    base_flags = re.compile('', flags).flags
+    compiled = [re.compile(value, flags) for value in values]
+    combinable = [i for i, p in enumerate(compiled) if not p.groups and p.flags == base_flags]
+    separate = [(i, p.search) for i, p in enumerate(compiled) if p.groups or p.flags != base_flags]
+    # Note: the combinable patterns are split into batches, since the re module (on py2) limits the number of groups
+    combined = []
+    for start in range(0, len(combinable), MAX_COMBINED_PATTERNS):
+        batch = combinable[start:start + MAX_COMBINED_PATTERNS]
+        combined.append(re.compile('|'.join('(?P<_%d>%s)' % (i, compiled[i].pattern) for i in batch), flags).search)
+
+    def matcher(item):
+        for search in combined:
+            m = search(item)
+            if m:
+                # the name of the matching alternative identifies the pattern
+                return int(m.lastgroup[1:])
+        for i, search in separate:
+            if search(item):
+                return i
+        return None
+
+    return matcher
+
+
 def get_index_distance_stats(indexes1, indexes2):
     """
     Calculates statistics about the distances between
@@ -208,23 +446,48 @@ def get_index_distance_stats(indexes1, indexes2):
 
     >>> get_index_distance_stats([4, 16, 36, 64], [9, 25, 49, 81])
     {'max': 77, 'mean': 30.25, 'min': 5}
+
+    >>> get_index_distance_stats({7, 2}, {2})
+    {'max': 5, 'mean': 2.5, 'min': 0}
     """
     if not indexes1:
         raise ValueError('indexes1 is invalid')
     if not indexes2:
         raise ValueError('indexes2 is invalid')
-    distances = [abs(x[0] - x[1]) for x in itertools.product(indexes1, indexes2)]
-    try:
-        min_dist = min(distances)
-        max_dist = max(distances)
-        mean_dist = sum(distances) / float(len(distances))
-    except ValueError:
-        min_dist = None
-        max_dist = None
-    try:
-        mean_dist = sum(distances) / float(len(distances))
-    except ZeroDivisionError:
-        mean_dist = None
+
+    # Note: the stats of all (len1 * len2) pairwise distances are computed without enumerating the pairs,
+    # which is O((len1 + len2) * log(len1 + len2)) (for the sorting) rather than O(len1 * len2).
+    indexes1 = sorted(indexes1)
+    indexes2 = sorted(indexes2)
+    len1, len2 = len(indexes1), len(indexes2)
+
+    # the max distance is between the extremes of the 2 sets
+    max_dist = max(indexes1[-1] - indexes2[0], indexes2[-1] - indexes1[0])
+
+    # the min distance is between neighbors (once the 2 sets are merged)
+    min_dist = None
+    i = j = 0
+    while i < len1 and j < len2:
+        distance = abs(indexes1[i] - indexes2[j])
+        if min_dist is None or distance < min_dist:
+            min_dist = distance
+        if indexes1[i] < indexes2[j]:
+            i += 1
+        else:
+            j += 1
+
+    # the sum of distances from each x (in indexes1) is the sum of (x - y) for all smaller y (in indexes2),
+    # plus the sum of (y - x) for all other y. the sums of y are prefix sums of indexes2.
+    total2 = sum(indexes2)
+    total_dist = 0
+    j = 0
+    prefix2 = 0
+    for x in indexes1:
+        while j < len2 and indexes2[j] < x:
+            prefix2 += indexes2[j]
+            j += 1
+        total_dist += (x * j - prefix2) + ((total2 - prefix2) - x * (len2 - j))
+    mean_dist = total_dist / float(len1 * len2)
     return {'min': min_dist, 'max': max_dist, 'mean': mean_dist}
 
 
@@ -259,13 +522,39 @@ def find_distances(item1, item2, items, regex=False, regex_flags=None, verbose=F
     {'max': 910, 'mean': 287.1212121212121, 'min': 21}
     """
 
-    def find_distinct_indexes(find_items, all_items, regex, regex_flags):
-        all_indexes = set()
-        for item in find_items:
-            indexes = find_all(item, all_items, regex=regex, regex_flags=regex_flags)
-            indexes = (index for (index, value) in indexes)
-            all_indexes.update(indexes)
-        return all_indexes
+    if is_string(item1):
+        item1 = [item1]
+    if is_string(item2):
+        item2 = [item2]
+
+    # find the matches for both sets of values with a single pass over the items
+    item1 = list(item1)
+    item2 = list(item2)
+    matcher1 = get_matcher(item1, regex=regex, regex_flags=regex_flags)
+    matcher2 = get_matcher(item2, regex=regex, regex_flags=regex_flags)
+    found1 = [[] for _ in item1]
+    found2 = [[] for _ in item2]
+    for index, value in enumerate(items):
+        i = matcher1(value)
+        if i is not None:
+            found1[i].append(index)
+        i = matcher2(value)
+        if i is not None:
+            found2[i].append(index)
+
+    return _get_found_distances(found1, found2, items, verbose)
+
+
+def _get_found_distances(found1, found2, items, verbose):
+    """
+    Calculates the distance stats (see find_distances()) for the (ascending) indexes found per value.
+
+    :param found1: a list of index lists (i.e. one per value/pattern in item1).
+    :param found2: a list of index lists (i.e. one per value/pattern in item2).
+    :param items: an indexable of items (i.e. which provides the matching item for each found index).
+    :param verbose: If True, the matching items will be included.
+    :return: a dict of statistical values.
+    """
 
     def get_matches_detail(indexes, items):
         # details = ((i, items[i]) for i in indexes)
@@ -282,13 +571,13 @@ def find_distances(item1, item2, items, regex=False, regex_flags=None, verbose=F
             # details[value].append(i)
         return details
 
-    if is_string(item1):
-        item1 = [item1]
-    if is_string(item2):
-        item2 = [item2]
-
-    indexes1 = find_distinct_indexes(item1, items, regex, regex_flags)
-    indexes2 = find_distinct_indexes(item2, items, regex, regex_flags)
+    # collect the indexes per value (or pattern), in the same sequence as the values
+    indexes1 = set()
+    for indexes in found1:
+        indexes1.update(indexes)
+    indexes2 = set()
+    for indexes in found2:
+        indexes2.update(indexes)
     d = get_index_distance_stats(indexes1, indexes2)
     if verbose:
         d.update({'matches1': get_matches_detail(indexes1, items)})
@@ -296,6 +585,179 @@ def find_distances(item1, item2, items, regex=False, regex_flags=None, verbose=F
     return d
 
 
+def get_content_hash(chunks):
+    """
+    Calculates a hash of some (e.g. file) content.
+
+    :param chunks: an iterable of bytes objects (i.e. the content).
+    :return: a hex digest string.
+
+    >>> get_content_hash([b'Lorem ', b'ipsum']) == get_content_hash([b'Lorem ipsum'])
+    True
+    """
+    h = hashlib.sha1()
+    for chunk in chunks:
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def write_token_index(fp, tokens, content_hash=None, delimiter=None, size=None, mtime=None):
+    """
+    Writes an inverted index (i.e. token -> ascending positions) of a sequence of tokens.
+
+    The index consists of a (JSON) header line, which maps each distinct token to the offset and length
+    of its positions, followed by the positions of all tokens (as a compact array of unsigned ints).
+    The header also records the hash of the content (and the delimiter) that the tokens were split from,
+    so that a stale index can be detected (see TokenIndex).
+    The size and mtime of the content (file) can be recorded too, so that the (full) hash only needs to be
+    recalculated when they have changed.
+
+    :param fp: a file-like object (opened in binary mode) to write the index to.
+    :param tokens: an iterable of (byte string) tokens.
+    :param content_hash: the hash of the content (see get_content_hash()).
+    :param delimiter: the delimiter that the tokens were split from the content with.
+    :param size: the size of the content (file), in bytes.
+    :param mtime: the modification time of the content (file).
+    :return: the header (a dict).
+    """
+    positions = OrderedDict()
+    count = 0
+    for i, token in enumerate(tokens):
+        try:
+            positions[token].append(i)
+        except KeyError:
+            positions[token] = array(TOKEN_INDEX_TYPECODE, [i])
+        count = i + 1
+
+    offset = 0
+    entries = OrderedDict()
+    for token, indexes in positions.items():
+        # Note: latin-1 maps each byte to a single code point, so any byte string can be round-tripped via JSON
+        entries[token.decode('latin-1')] = [offset, len(indexes)]
+        offset += len(indexes)
+    header = OrderedDict([
+        ('hash', content_hash),
+        ('delimiter', delimiter.decode('latin-1') if delimiter is not None else None),
+        ('size', size),
+        ('mtime', mtime),
+        ('count', count),
+        ('typecode', TOKEN_INDEX_TYPECODE),
+        ('itemsize', array(TOKEN_INDEX_TYPECODE).itemsize),
+        ('byteorder', sys.byteorder),
+        ('tokens', entries),
+    ])
+    fp.write(TOKEN_INDEX_MAGIC)
+    fp.write(json_utils.dumps(header, separators=(',', ':')).encode('utf-8') + b'\n')
+    for indexes in positions.values():
+        indexes.tofile(fp)
+    return header
+
+
+class TokenIndex(object):
+    """
+    Provides (read-only) access to an inverted token index written by write_token_index().
+
+    Only the header (i.e. the distinct tokens) is loaded up front.
+    The positions of a token are read from the file (via a seek) when they are requested.
+
+    >>> from tempfile import TemporaryFile
+    >>> with TemporaryFile() as fp:
+    ...     header = write_token_index(fp, [b'a', b'b', b'a'], content_hash='h', delimiter=b'\\n', size=5, mtime=1.5)
+    ...     index = TokenIndex(fp)
+    ...     index.count, index.content_hash, index.delimiter, sorted(index.tokens()), [int(i) for i in index.positions(b'a')]
+    ...     index.size, index.mtime
+    (3, u'h', '\\n', ['a', 'b'], [0, 2])
+    (5, 1.5)
+    """
+
+    def __init__(self, fp):
+        """
+        :param fp: a file-like object (opened in binary mode) which contains the index.
+        """
+        self.fp = fp
+        fp.seek(0)
+        if fp.readline() != TOKEN_INDEX_MAGIC:
+            raise ValueError('not a token index')
+        header = json_utils.loads(fp.readline().decode('utf-8'))
+        if header['typecode'] != TOKEN_INDEX_TYPECODE or \
+                header['itemsize'] != array(TOKEN_INDEX_TYPECODE).itemsize or header['byteorder'] != sys.byteorder:
+            raise ValueError('incompatible token index')
+        self.base = fp.tell()
+        self.content_hash = header['hash']
+        self.delimiter = header['delimiter'].encode('latin-1') if header['delimiter'] is not None else None
+        # Note: indexes written without the size and mtime can still be validated via the hash
+        self.size = header.get('size')
+        self.mtime = header.get('mtime')
+        self.count = header['count']
+        self.itemsize = header['itemsize']
+        self.entries = dict((k.encode('latin-1'), v) for k, v in header['tokens'].items())
+
+    def tokens(self):
+        """
+        :return: an iterable of the distinct tokens.
+        """
+        return self.entries.keys()
+
+    def positions(self, token):
+        """
+        :param token: a token.
+        :return: an array of the (ascending) positions of the token. Empty if the token does not occur.
+        """
+        indexes = array(TOKEN_INDEX_TYPECODE)
+        entry = self.entries.get(token)
+        if entry:
+            offset, length = entry
+            self.fp.seek(self.base + offset * self.itemsize)
+            indexes.fromfile(self.fp, length)
+        return indexes
+
+
+def find_indexed_distances(item1, item2, index, regex=False, regex_flags=None, verbose=False):
+    """
+    Same as find_distances(), except that the matches are looked up in an inverted token index (see TokenIndex)
+    rather than found by scanning the items.
+
+    The values/patterns are matched against the distinct tokens only (rather than against every item),
+    and the positions of the matching tokens are then read from the index.
+
+    :param item1: the value (or pattern) to match/find.
+        If it is not a string, it will be treated as an iterable of values/patterns to match.
+    :param item2: the value (or pattern) to match/find.
+        If it is not a string, it will be treated as an iterable of values/patterns to match.
+    :param index: a <TokenIndex>.
+    :param regex: If True, item will be treated as a regex pattern.
+    :param regex_flags: Optional flags for re.search().
+    :return:
+    """
+    if is_string(item1):
+        item1 = [item1]
+    if is_string(item2):
+        item2 = [item2]
+
+    item1 = list(item1)
+    item2 = list(item2)
+    items = {}
+
+    def find(values):
+        found = [[] for _ in values]
+        matcher = get_matcher(values, regex=regex, regex_flags=regex_flags)
+        tokens = ((matcher(token), token) for token in index.tokens())
+        for i, token in tokens:
+            if i is None:
+                continue
+            indexes = [int(j) for j in index.positions(token)]
+            found[i].extend(indexes)
+            if verbose:
+                items.update((j, token) for j in indexes)
+        for indexes in found:
+            indexes.sort()
+        return found
+
+    found1 = find(item1)
+    found2 = find(item2)
+    return _get_found_distances(found1, found2, items, verbose)
+
+
 def main():
     import doctest
     fail, total = doctest.testmod(optionflags=(doctest.REPORT_NDIFF | doctest.REPORT_ONLY_FIRST_FAILURE))
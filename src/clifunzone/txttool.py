@@ -1,12 +1,17 @@
-import json
 import logging
+import os
 import re
+from collections import Counter
+from contextlib import contextmanager
 from pprint import pformat
 
 import click
 
 from clifunzone import click_utils
 from clifunzone import dict_utils
+from clifunzone import input_utils
+from clifunzone import json_utils
+from clifunzone import multiprocessing_utils
 from clifunzone import txt_utils
 
 
@@ -59,11 +64,7 @@ def echo(input, **kwargs):
     """
     Echo the (unparsed) input.
     """
-    if not input:
-        input = '-'
-    with click.open_file(input, mode='rb') as f:
-        s = f.read()
-        click.echo(s)
+    click_utils.echo_chunks(input_utils.iter_chunks(input))
 
 
 @cli.command()
@@ -79,34 +80,55 @@ def echo(input, **kwargs):
               help='enables a flattened (vs. nested) hierarchical structure for the output.')
 @click.option('--verbose', '-v', is_flag=True, type=click.BOOL,
               help='enables more detailed output.')
-def info(input, output_format, verbose, flat, **kwargs):
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=1,
+              help='the number of parallel processes to count the (file) input with.'
+                   ' The file is divided into (whitespace aligned) ranges, which are counted separately.')
+def info(input, output_format, verbose, flat, jobs, **kwargs):
     """
     Provides info about the input.
     """
-    if not input:
-        input = '-'
-    with click.open_file(input, mode='rb') as f:
-        data = f.read()
-        d = {}
-        d.update({'content': txt_utils.get_info(data)})
-        # if verbose:
-        #     d['_object'] = {
-        #         'type': type(data),
-        #         'members': sorted(varsdict(data).keys())
-        #     }
-        if flat:
-            d = dict_utils.flatten(d)
-
-        if not output_format:
-            output_format = 'json'
-        if output_format == 'pydict':
-            s = pformat(d)
-        elif output_format == 'json':
-            s = json.dumps(d, indent=2, sort_keys=True)
-        # elif output_format == 'xml':
-        else:
-            raise NotImplementedError('Unsupported output format: %s' % output_format)
-        click.echo(s)
+    d = {}
+    # Note: only regular files are divided into ranges (i.e. other inputs, e.g. pipes, are streamed)
+    if jobs > 1 and input and input != '-' and os.path.isfile(input):
+        with input_utils.open_buffer(input) as data:
+            tasks = [(input, start, end) for start, end in input_utils.split_ranges(data, jobs)]
+        chars, words = Counter(), Counter()
+        for range_chars, range_words in multiprocessing_utils.imap_processes(count_range, tasks, processes=jobs):
+            chars.update(range_chars)
+            words.update(range_words)
+        d.update({'content': txt_utils.get_counts_info(chars, words)})
+    else:
+        d.update({'content': txt_utils.get_stream_info(input_utils.iter_chunks(input))})
+    # if verbose:
+    #     d['_object'] = {
+    #         'type': type(data),
+    #         'members': sorted(varsdict(data).keys())
+    #     }
+    if flat:
+        d = dict_utils.flatten(d)
+
+    if not output_format:
+        output_format = 'json'
+    if output_format == 'pydict':
+        s = pformat(d)
+    elif output_format == 'json':
+        s = json_utils.dumps(d, indent=2, sort_keys=True)
+    # elif output_format == 'xml':
+    else:
+        raise NotImplementedError('Unsupported output format: %s' % output_format)
+    click.echo(s)
+
+
+def count_range(task):
+    """
+    Counts the chars and words within a range of an input file (see txt_utils.count_stream()).
+
+    :param task: a (path, start, end) tuple.
+    :return: a (chars, words) tuple of <collections.Counter> instances.
+    """
+    path, start, end = task
+    with input_utils.open_buffer(path) as data:
+        return txt_utils.count_stream(input_utils.iter_buffer_chunks(data, start=start, end=end))
 
 
 @cli.command(short_help='outputs lorem ipsum text')
@@ -133,26 +155,28 @@ def split(input, split_scope, separator, **kwargs):
     """
     Splits the input into tokens.
     """
-    if not input:
-        input = '-'
-    with click.open_file(input, mode='rb') as f:
-        data = f.read()
-
-        if not split_scope:
-            split_scope = 'whitespace'
-        if split_scope == 'whitespace':
-            tokens = data.split()
-        elif split_scope == 'word':
-            tokens = txt_utils.get_words(data)
-        # elif split_scope == 'sentence':
-        #     tokens = txt_utils.get_sentences(data)
-        else:
-            raise NotImplementedError('Unsupported split scope: %s' % split_scope)
-        if separator:
-            click.echo(separator.join(tokens))
-        else:
-            for s in tokens:
-                click.echo(s)
+    if not split_scope:
+        split_scope = 'whitespace'
+    chunks = input_utils.iter_text_chunks(input)
+    if split_scope == 'whitespace':
+        tokens = txt_utils.iter_tokens(chunks)
+    elif split_scope == 'word':
+        tokens = txt_utils.iter_words(chunks)
+    # elif split_scope == 'sentence':
+    #     tokens = txt_utils.get_sentences(data)
+    else:
+        raise NotImplementedError('Unsupported split scope: %s' % split_scope)
+
+    def separated(tokens):
+        for i, token in enumerate(tokens):
+            if i:
+                yield separator
+            yield token
+
+    if separator:
+        click_utils.echo_chunks(separated(tokens))
+    else:
+        click_utils.echo_chunks((token + '\n' for token in tokens), nl=False)
 
 
 @cli.command(short_help='removes portions of the input')
@@ -173,7 +197,12 @@ def split(input, split_scope, separator, **kwargs):
               help='causes regex operations to be performed case-insensitively.')
 @click.option('--verbose', '-v', is_flag=True, type=click.BOOL,
               help='enables more detailed output.')
-def distance(input, delimiter, values1, values2, regex, regex_ignore_case, verbose, **kwargs):
+@click.option('--index', 'use_index', is_flag=True, type=click.BOOL,
+              help="answers the query from the input's token index (see the 'index' command)."
+                   ' The index is (re)built if it is missing or stale.')
+@click.option('--index-file', 'index_path', type=click.Path(dir_okay=False),
+              help="the path of the token index. Implies '--index'. Defaults to the input path + '.index'.")
+def distance(input, delimiter, values1, values2, regex, regex_ignore_case, verbose, use_index, index_path, **kwargs):
     """
     Calculates distance metrics for 2 sets of 'search' values against a sequence of tokens.
 
@@ -223,18 +252,108 @@ def distance(input, delimiter, values1, values2, regex, regex_ignore_case, verbo
         $ python -m clifunzone.txttool lorem | python -m clifunzone.txttool split -sw | \
         python -m clifunzone.txttool distance -r -ri -v1 '^Pellentesque$' -v2 '^Vivamus'
         {'max': 910, 'mean': 287.1212121212121, 'min': 21}
+
+        \b
+        Example: Indexed (the index is built by the first query, and reused by later ones):
+        $ python -m clifunzone.txttool lorem | python -m clifunzone.txttool split -sw > lorem.txt
+        $ python -m clifunzone.txttool distance -i lorem.txt --index -v1 Lorem -v2 sit -v2 amet
+        {'max': 852, 'mean': 483.5, 'min': 3}
     """
-    if not input:
-        input = '-'
     if not delimiter:
         delimiter = '\n'
-    with click.open_file(input, mode='rb') as f:
-        data = f.read()
+    flags = re.IGNORECASE if regex_ignore_case else None
+    if use_index or index_path:
+        with open_token_index(input, delimiter, index_path) as index:
+            output = txt_utils.find_indexed_distances(values1, values2, index, regex=regex, regex_flags=flags,
+                                                      verbose=verbose)
+            click.echo(output)
+        return
+    tokens = list(input_utils.iter_split_chunks(input_utils.iter_chunks(input), delimiter))
+    output = txt_utils.find_distances(values1, values2, tokens, regex=regex, regex_flags=flags, verbose=verbose)
+    click.echo(output)
+
 
-        tokens = data.split(delimiter)
-        flags = re.IGNORECASE if regex_ignore_case else None
-        output = txt_utils.find_distances(values1, values2, tokens, regex=regex, regex_flags=flags, verbose=verbose)
-        click.echo(output)
+@cli.command()
+@click.option('--input', '-i', type=click.Path(exists=True, dir_okay=False, allow_dash=False), required=True,
+              help="the path to the file containing the input.")
+@click.option('--delimiter', '-d', type=click.STRING,
+              help="the delimiter which separates the input's tokens. Defaults to newline.")
+@click.option('--output', '-o', 'index_path', type=click.Path(dir_okay=False),
+              help="the path of the token index. Defaults to the input path + '.index'.")
+def index(input, delimiter, index_path, **kwargs):
+    """
+    Builds an inverted token index (i.e. token -> positions) of a (delimited) input file.
+
+    The index can be used to answer 'distance' queries without re-reading the input (see 'distance --index').
+    It records the size, mtime and hash of the input, so that a stale index is rebuilt rather than used.
+    (The input is only re-hashed when its size or mtime differ from the recorded ones.)
+
+    Example:
+
+        \b
+        $ python -m clifunzone.txttool lorem | python -m clifunzone.txttool split -sw > lorem.txt
+        $ python -m clifunzone.txttool index -i lorem.txt
+        {"count": 1010, "path": "lorem.txt.index", "tokens": 183}
+    """
+    if not delimiter:
+        delimiter = '\n'
+    index_path = index_path or input + '.index'
+    header = build_token_index(input, delimiter, index_path)
+    d = {'path': index_path, 'count': header['count'], 'tokens': len(header['tokens'])}
+    click.echo(json_utils.dumps(d, sort_keys=True))
+
+
+def build_token_index(input, delimiter, index_path, content_hash=None):
+    """
+    Writes the token index of an input file (see txt_utils.write_token_index()).
+
+    :param content_hash: the hash of the input (if it is already known).
+    :return: the index header (a dict).
+    """
+    # Note: stat the input before reading it, so that a concurrent modification makes the index look stale
+    stat = os.stat(input)
+    if content_hash is None:
+        content_hash = txt_utils.get_content_hash(input_utils.iter_chunks(input))
+    tokens = input_utils.iter_split_chunks(input_utils.iter_chunks(input), delimiter)
+    with open(index_path, 'wb') as fp:
+        return txt_utils.write_token_index(fp, tokens, content_hash=content_hash, delimiter=delimiter,
+                                           size=stat.st_size, mtime=stat.st_mtime)
+
+
+@contextmanager
+def open_token_index(input, delimiter, index_path=None):
+    """
+    Opens the token index of an input file, (re)building the index first if it is missing or stale.
+
+    The input is only hashed (i.e. read in full) when its size or mtime differ from the ones recorded in the index.
+
+    :return: a context manager which provides a <txt_utils.TokenIndex>.
+    """
+    if not input or input == '-':
+        raise ValueError('"index" mode requires an input file (not stdin).')
+    index_path = index_path or input + '.index'
+    stat = os.stat(input)
+    content_hash = None
+    for _ in range(2):
+        if os.path.isfile(index_path):
+            with open(index_path, 'rb') as fp:
+                try:
+                    index = txt_utils.TokenIndex(fp)
+                except ValueError:
+                    index = None
+                if index and index.delimiter == delimiter:
+                    # Note: (like git) don't trust an mtime which is not older than the index itself,
+                    # as the input may have been modified again within the resolution of the mtime.
+                    if index.size == stat.st_size and index.mtime == stat.st_mtime and \
+                            stat.st_mtime < os.fstat(fp.fileno()).st_mtime:
+                        yield index
+                        return
+                    content_hash = content_hash or txt_utils.get_content_hash(input_utils.iter_chunks(input))
+                    if index.content_hash == content_hash:
+                        yield index
+                        return
+        build_token_index(input, delimiter, index_path, content_hash)
+    raise ValueError('unable to build the token index: %s' % index_path)
 
 
 def main():
@@ -15,7 +15,7 @@ except ImportError:
     def iteritems(mapping):
         return getattr(mapping, 'iteritems', mapping.items)()
 
-__all__ = ['walk_items']
+__all__ = ['AncestorPath', 'iter_walk', 'walk_items']
 
 
 def nested_dict_iter(nested):
@@ -37,11 +37,140 @@ def nested_dict_iter(nested):
         yield key, value
 
 
-def walk_items(obj, values_only=False, ancestors=True, keys_as_ancestors=False, obj_ancestors=(), key=None):
+class AncestorPath(object):
     """
-    Recursively walks a nested object hierarchy, yielding (depth, key, value, ancestors) tuples as it walks.
+    A persistent (i.e. immutable and shared) linked path of hierarchical ancestors (with the root first).
 
-    The walk is performed depth-first.
+    Each path links to its parent path, so extending a path (see child()) is O(1),
+    and all the paths within a walk share their common ancestors (rather than each copying them).
+    The ancestors are only materialized (as a tuple) when requested (e.g. see as_tuple()), and the tuple is cached.
+
+    >>> path = AncestorPath().child('a').child('b').child('c')
+    >>> len(path), path.value, path[-2], path.as_tuple()
+    (3, 'c', 'b', ('a', 'b', 'c'))
+
+    >>> path = AncestorPath.from_tuple(('a', 'b')).child('c'); path, path[0:2], path[-3]
+    (AncestorPath(('a', 'b', 'c')), ('a', 'b'), 'a')
+    """
+
+    __slots__ = ('parent', 'value', 'depth', '_tuple')
+
+    def __init__(self, parent=None, value=None):
+        """
+        :param parent: the parent path. If None, the path is empty (i.e. has no ancestors).
+        :param value: the last ancestor (i.e. the direct parent). Ignored if parent is None.
+        """
+        self.parent = parent
+        self.value = value if parent is not None else None
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self._tuple = None if parent is not None else ()
+
+    @classmethod
+    def from_tuple(cls, ancestors):
+        """
+        :param ancestors: a tuple of ancestors (with the root first).
+        :return: a path containing the ancestors.
+        """
+        path = cls()
+        if ancestors:
+            path.value = ancestors[-1]
+            path.depth = len(ancestors)
+            path._tuple = tuple(ancestors)
+        return path
+
+    def child(self, value):
+        """
+        :param value: the next ancestor.
+        :return: a new path, which extends this path with the specified ancestor.
+        """
+        return AncestorPath(self, value)
+
+    def as_tuple(self):
+        """
+        :return: the ancestors as a tuple (with the root first).
+        """
+        if self._tuple is None:
+            values = []
+            path = self
+            while path._tuple is None:
+                values.append(path.value)
+                path = path.parent
+            values.reverse()
+            self._tuple = path._tuple + tuple(values)
+        return self._tuple
+
+    def __len__(self):
+        return self.depth
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __getitem__(self, index):
+        if isinstance(index, int) and -self.depth <= index < 0:
+            # i.e. a 'near' ancestor, which can be reached without materializing the path
+            steps = -index - 1
+            path = self
+            while steps and path.parent is not None:
+                path = path.parent
+                steps -= 1
+            return path.value if path.parent is not None else path._tuple[-1 - steps]
+        return self.as_tuple()[index]
+
+    def __repr__(self):
+        return 'AncestorPath(%r)' % (self.as_tuple(),)
+
+
+def iter_walk(obj, values_only=False, keys_as_ancestors=False, prune=None, path=None, key=None):
+    """
+    Walks a nested object hierarchy iteratively, yielding (depth, key, value, path) tuples as it walks.
+
+    The walk is performed depth-first, with an explicit stack (i.e. its depth is not limited by the recursion limit).
+    The ancestors of each value are provided as an <AncestorPath>, which is shared with the rest of the walk
+    (and is only materialized as a tuple if the caller requests it). See walk_items() for the other details.
+
+    :param obj: a python object.
+    :param values_only: if True, then only non-collection values will be yielded.
+    :param keys_as_ancestors: if True, then keys and indexes will be treated as an ancestor.
+    :param prune: an (optional) function, which accepts depth, key and value params,
+        and returns True if the descendants of that (collection) value should be skipped.
+    :param path: the hierarchical ancestors of obj (see <AncestorPath>).
+    :param key: the key (for Mappings) or index (for Sequences) of obj within obj's direct ancestor/parent.
+    :return: (depth, key, value, path) tuples.
+
+    >>> d = OrderedDict((('a', [1, 2]), ('b', OrderedDict((('c', 3),)))))
+    >>> [(depth, key, value, path[-1]) for depth, key, value, path in iter_walk(d, values_only=True)]
+    [(2, 0, 1, [1, 2]), (2, 1, 2, [1, 2]), (2, 'c', 3, OrderedDict([('c', 3)]))]
+
+    >>> [(depth, key, value) for depth, key, value, path in iter_walk(d, prune=lambda depth, key, value: key == 'a')]
+    [(0, None, OrderedDict([('a', [1, 2]), ('b', OrderedDict([('c', 3)]))])), (1, 'a', [1, 2]), \
+(1, 'b', OrderedDict([('c', 3)])), (2, 'c', 3)]
+    """
+    if path is None:
+        path = AncestorPath()
+    # each entry: (the path of the collection, the collection's items, whether the keys are ancestors)
+    stack = [(path, iter(((key, obj),)), False)]
+    while stack:
+        base, items, add_keys = stack[-1]
+        for key, value in items:
+            path = base.child(key) if add_keys else base
+            is_map = isinstance(value, Mapping)
+            is_collection = is_map or (isinstance(value, (Sequence, Set)) and not isinstance(value, string_types))
+            if not values_only or not is_collection:
+                yield path.depth, key, value, path
+            if is_collection and not (prune and prune(path.depth, key, value)):
+                stack.append((path.child(value), iteritems(value) if is_map else enumerate(value), keys_as_ancestors))
+                break
+        else:
+            stack.pop()
+
+
+def walk_items(obj, values_only=False, ancestors=True, keys_as_ancestors=False, obj_ancestors=(), key=None,
+               prune=None):
+    """
+    Walks a nested object hierarchy, yielding (depth, key, value, ancestors) tuples as it walks.
+
+    The walk is performed depth-first (see iter_walk()). The ancestors tuples are only built if ancestors is True
+    (and are shared by sibling values, unless keys_as_ancestors is True).
 
     Adapted from: https://gist.github.com/sente/1480558
     Adapted from: http://stackoverflow.com/a/32935278
@@ -54,6 +183,8 @@ def walk_items(obj, values_only=False, ancestors=True, keys_as_ancestors=False,
     :param keys_as_ancestors: if True, then keys and indexes will be treated as an ancestor.
     :param obj_ancestors: the hierarchical ancestors (with the root first and direct parent last) of obj.
     :param key: the key (for Mappings) or index (for Sequences) of obj within obj's direct ancestor/parent.
+    :param prune: an (optional) function, which accepts depth, key and value params,
+        and returns True if the descendants of that (collection) value should be skipped.
     :return: (depth, key, value, ancestors) tuples.
         if obj is a Mapping, key will be a key.
         elif obj is a Sequence, key will be an index.
@@ -195,26 +326,13 @@ def walk_items(obj, values_only=False, ancestors=True, keys_as_ancestors=False,
     >>> list(d)
     ["#1. d['f']=6", "#2. a['b']=2", "#4. g['h']=8"]
     """
-    is_map = isinstance(obj, Mapping)
-    is_seq = isinstance(obj, (Sequence, Set)) and not isinstance(obj, string_types)
-    is_collection = bool(is_map or is_seq)
-    if not values_only or not is_collection:
+    path = AncestorPath.from_tuple(obj_ancestors)
+    for depth, key, value, path in iter_walk(obj, values_only=values_only, keys_as_ancestors=keys_as_ancestors,
+                                             prune=prune, path=path, key=key):
         if ancestors:
-            yield len(obj_ancestors), key, obj, obj_ancestors
+            yield depth, key, value, path.as_tuple()
         else:
-            yield len(obj_ancestors), key, obj
-    if is_collection:
-        if is_map:
-            items = iteritems(obj)
-        elif is_seq:
-            items = enumerate(obj)
-        for key, value in items:
-            obj_ancestors2 = obj_ancestors + (obj,)
-            if keys_as_ancestors:
-                obj_ancestors2 += (key,)
-            for child in walk_items(value, obj_ancestors=obj_ancestors2, key=key,
-                                    values_only=values_only, ancestors=ancestors, keys_as_ancestors=keys_as_ancestors):
-                yield child
+            yield depth, key, value
 
 
 def main():
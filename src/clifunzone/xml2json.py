@@ -27,12 +27,13 @@ that completely if it makes more sense...
 R. White, 2006 November 6
 """
 
-import json
 import optparse
 import sys
 import xml.etree.cElementTree as ET
 from collections import OrderedDict
 
+from clifunzone import json_utils
+
 
 def strip_tag(tag):
     strip_ns_tag = tag
@@ -47,68 +48,187 @@ def elem_to_internal(elem, strip_attribute=False, strip_namespace=True, strip_wh
     """
     Convert an Element into an internal dictionary (not JSON!).
 
+    The conversion is iterative (i.e. it uses an explicit stack rather than recursion),
+    so arbitrarily deep documents can be converted without hitting the recursion limit.
+
     :param elem: the <ElementTree.Element> to convert.
     :param strip_attribute: If True, attributes will be ignored.
     :param strip_namespace: If True, namespaces will be ignored.
     :param strip_whitespace: If True, 'unimportant' whitespace will be ignored.
     :param factory: a dict-like object type. Defaults to <collections.OrderedDict>.
     :return: a dict-like object.
+
+    >>> elem_to_internal(ET.fromstring('<a x="1">u<b>t</b><b/></a>'))
+    OrderedDict([('a', OrderedDict([('@x', '1'), ('b', ['t', None]), ('#text', 'u')]))])
+
+    >>> depth = sys.getrecursionlimit() + 1
+    >>> elem_to_internal(ET.fromstring('<a>' * depth + '</a>' * depth), factory=dict)['a']['a']['a'] is None
+    False
     """
 
     if factory is None:
         # factory = dict
         factory = OrderedDict
 
-    d = factory()
+    def start(elem):
+        tag = elem.tag
+        if strip_namespace:
+            tag = strip_tag(tag)
+
+        d = factory()
+        if not strip_attribute:
+            for key, value in list(elem.attrib.items()):
+                d['@' + key] = value
+        return elem, tag, d, iter(elem)
+
+    def end(elem, d):
+        text = elem.text
+        tail = elem.tail
+        if strip_whitespace:
+            # ignore leading and trailing whitespace
+            if text:
+                text = text.strip()
+            if tail:
+                tail = tail.strip()
 
-    elem_tag = elem.tag
-    if strip_namespace:
-        elem_tag = strip_tag(elem.tag)
+        if tail:
+            d['#tail'] = tail
+
+        if d:
+            # use #text element if other attributes exist
+            if text:
+                d["#text"] = text
+        else:
+            # text is the value if no attributes
+            d = text or None
+        return d
+
+    # each stack entry holds an element, its (stripped) tag, its (partial) value, and an iterator of its subelements
+    stack = [start(elem)]
+    while True:
+        elem, tag, d, subelems = stack[-1]
+        for subelem in subelems:
+            stack.append(start(subelem))
+            break
+        else:
+            # all subelements have been merged, so the element is complete
+            stack.pop()
+            value = end(elem, d)
+            if not stack:
+                return factory([(tag, value)])
+
+            # merge the element into its parent
+            d = stack[-1][2]
+            try:
+                # add to existing list for this tag
+                d[tag].append(value)
+            except AttributeError:
+                # turn existing entry into a list
+                d[tag] = [d[tag], value]
+            except KeyError:
+                # add a new non-list entry
+                d[tag] = value
+
+
+def iterencode_elem(elem, strip_attribute=False, strip_namespace=True, strip_whitespace=True, pretty=False):
+    """
+    Incrementally encode an Element as JSON, without building the internal dictionary.
 
-    if not strip_attribute:
-        for key, value in list(elem.attrib.items()):
-            d['@' + key] = value
+    The chunks (when joined) are identical to the output of elem2json() (with the default factory),
+    including the merging of repeated sibling tags into a list (at the position of the first occurrence).
 
-    # loop over subelements to merge them
-    for subelem in elem:
-        v = elem_to_internal(subelem, strip_attribute=strip_attribute, strip_namespace=strip_namespace,
-                             strip_whitespace=strip_whitespace, factory=factory)
+    :param elem: the <ElementTree.Element> to convert.
+    :param strip_attribute: If True, attributes will be ignored.
+    :param strip_namespace: If True, namespaces will be ignored.
+    :param strip_whitespace: If True, 'unimportant' whitespace will be ignored.
+    :param pretty: If True, the output will be pretty-formatted (like elem2json()).
+    :return: an iterable of JSON string chunks.
 
-        tag = subelem.tag
-        if strip_namespace:
-            tag = strip_tag(subelem.tag)
+    >>> ''.join(iterencode_elem(ET.fromstring('<royg> <r/> <o/> <y/> <r e="d"/> <g/></royg>')))
+    '{"royg": {"r": [null, {"@e": "d"}], "o": null, "y": null, "g": null}}'
+    """
 
-        value = v[tag]
+    encode = json_utils.dumps
+    item_separator = ',' if pretty else ', '
+    key_separator = ': '
+
+    def newline(level):
+        return '\n' + '    ' * level if pretty else ''
+
+    def members(elem):
+        # the (encoded key, value) pairs of the element's dict. Or the encoded value if the element is not a dict.
+        # a value is either an encoded scalar, an element, or a list of (same tag) sibling elements.
+        items = []
+        if not strip_attribute:
+            for key, value in list(elem.attrib.items()):
+                items.append((encode('@' + key), encode(value)))
+
+        groups = OrderedDict()
+        for subelem in elem:
+            tag = subelem.tag
+            if strip_namespace:
+                tag = strip_tag(tag)
+            try:
+                groups[tag].append(subelem)
+            except KeyError:
+                groups[tag] = [subelem]
+        for tag, subelems in groups.items():
+            items.append((encode(tag), subelems if len(subelems) > 1 else subelems[0]))
+
+        text = elem.text
+        tail = elem.tail
+        if strip_whitespace:
+            if text:
+                text = text.strip()
+            if tail:
+                tail = tail.strip()
 
-        try:
-            # add to existing list for this tag
-            d[tag].append(value)
-        except AttributeError:
-            # turn existing entry into a list
-            d[tag] = [d[tag], value]
-        except KeyError:
-            # add a new non-list entry
-            d[tag] = value
-    text = elem.text
-    tail = elem.tail
-    if strip_whitespace:
-        # ignore leading and trailing whitespace
-        if text:
-            text = text.strip()
         if tail:
-            tail = tail.strip()
+            items.append(('"#tail"', encode(tail)))
 
-    if tail:
-        d['#tail'] = tail
+        if items:
+            if text:
+                items.append(('"#text"', encode(text)))
+            return items
+        return encode(text or None)
 
-    if d:
-        # use #text element if other attributes exist
-        if text:
-            d["#text"] = text
-    else:
-        # text is the value if no attributes
-        d = text or None
-    return factory([(elem_tag, d)])
+    tag = elem.tag
+    if strip_namespace:
+        tag = strip_tag(tag)
+
+    # each stack entry holds an iterator of (keyed or unkeyed) items, the closing char, the nesting level,
+    # whether the items are keyed, and whether the next item is the first one
+    yield '{'
+    stack = [[iter([(encode(tag), elem)]), '}', 0, True, True]]
+    while stack:
+        frame = stack[-1]
+        items, close, level, keyed, _ = frame
+        for item in items:
+            prefix = newline(level + 1) if frame[4] else item_separator + newline(level + 1)
+            frame[4] = False
+            if keyed:
+                key, value = item
+                prefix += key + key_separator
+            else:
+                value = item
+
+            if isinstance(value, str):
+                yield prefix + value
+                continue
+            if isinstance(value, list):
+                yield prefix + '['
+                stack.append([iter(value), ']', level + 1, False, True])
+                break
+            value = members(value)
+            if isinstance(value, str):
+                yield prefix + value
+                continue
+            yield prefix + '{'
+            stack.append([iter(value), '}', level + 1, True, True])
+            break
+        else:
+            stack.pop()
+            yield newline(level) + close
 
 
 def internal_to_elem(pfsh, factory=ET.Element):
@@ -159,9 +279,9 @@ def elem2json(elem, strip_attribute=False, strip_namespace=True, strip_whitespac
     d = elem_to_internal(elem, strip_attribute=strip_attribute, strip_namespace=strip_namespace,
                          strip_whitespace=strip_whitespace, factory=factory)
     if pretty:
-        return json.dumps(d, indent=4, separators=(',', ': '))
+        return json_utils.dumps(d, indent=4, separators=(',', ': '))
     else:
-        return json.dumps(d)
+        return json_utils.dumps(d)
 
 
 def json2elem(json_data, factory=ET.Element):
@@ -171,7 +291,7 @@ def json2elem(json_data, factory=ET.Element):
     as the factory parameter.
     """
 
-    return internal_to_elem(json.loads(json_data), factory)
+    return internal_to_elem(json_utils.loads(json_data), factory)
 
 
 def xml2json(xmlstring, strip_attribute=0, strip_namespace=1, strip_whitespace=1, factory=None, pretty=False):
@@ -189,7 +309,7 @@ def json2xml(json_data, factory=ET.Element):
     as the factory parameter.
     """
     if not isinstance(json_data, dict):
-        json_data = json.loads(json_data)
+        json_data = json_utils.loads(json_data)
 
     elem = internal_to_elem(json_data, factory)
     return ET.tostring(elem)
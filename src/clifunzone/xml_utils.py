@@ -1,5 +1,8 @@
+import re
 from collections import OrderedDict
 
+from six import string_types
+
 from clifunzone import reflection_utils
 from clifunzone import xml2json
 
@@ -11,6 +14,12 @@ except ImportError:
     except ImportError:
         import xml.etree.ElementTree as ET
 
+# the max number of compiled XPath expressions retained by compile_xpath()
+XPATH_CACHE_SIZE = 256
+
+_xpath_cache = OrderedDict()
+_xpath_cache_stats = {'hits': 0, 'misses': 0}
+
 
 def contains_valid_xml(obj):
     """
@@ -145,6 +154,61 @@ def xml_to_json(xmlstring, strip_attribute=False, strip_namespace=False, strip_w
                              strip_whitespace=strip_whitespace, pretty=pretty)
 
 
+def iter_xml_to_json(source, strip_attribute=False, strip_namespace=False, strip_whitespace=True, pretty=False):
+    r"""
+    Converts XML to JSON, incrementally.
+
+    The output is written (as it is encoded) directly from the parsed element tree,
+    rather than from an intermediate dict (and then a single string), as xml_to_json() does.
+    The joined chunks are identical to the output of xml_to_json().
+
+    :param source: a file-like object (or file path) containing the XML.
+    :param strip_attribute: If True, attributes will be ignored.
+    :param strip_namespace: If True, namespaces will be ignored.
+    :param strip_whitespace: If True, 'unimportant' whitespace will be ignored.
+    :param pretty: If True, the output will be pretty-formatted.
+    :return: an iterable of JSON string chunks.
+
+    >>> from io import BytesIO
+    >>> ''.join(iter_xml_to_json(BytesIO(b'<a/>'), pretty=True))
+    '{\n    "a": null\n}'
+
+    >>> ''.join(iter_xml_to_json(BytesIO(b'<constants><constant id="pi"/><constant id="zero">0</constant></constants>')))
+    '{"constants": {"constant": [{"@id": "pi"}, {"@id": "zero", "#text": "0"}]}}'
+    """
+    root = xml2json.ET.parse(source).getroot()
+    return xml2json.iterencode_elem(root, strip_attribute=strip_attribute, strip_namespace=strip_namespace,
+                                    strip_whitespace=strip_whitespace, pretty=pretty)
+
+
+def iter_xml_records_to_json(source, xpath, strip_attribute=False, strip_namespace=False, strip_whitespace=True):
+    r"""
+    Converts each XML element that matches a simple XPath location path (see parse_simple_xpath())
+    into its own (compact) JSON string, incrementally.
+
+    Each record is converted (as with xml_to_json()) and freed as soon as it has been parsed,
+    so memory usage does not depend upon the number of records.
+
+    :param source: a file-like object (or file path) containing the XML.
+    :param xpath: a simple XPath location path.
+    :param strip_attribute: If True, attributes will be ignored.
+    :param strip_namespace: If True, namespaces will be ignored.
+    :param strip_whitespace: If True, 'unimportant' whitespace will be ignored.
+    :return: an iterable of JSON strings (one per matching element).
+
+    >>> from io import BytesIO
+    >>> list(iter_xml_records_to_json(BytesIO(b'<rs> <r id="1"/> <r>x</r> </rs>'), '/rs/r'))
+    ['{"r": {"@id": "1"}}', '{"r": "x"}']
+    """
+
+    def serialize(element):
+        return ''.join(xml2json.iterencode_elem(element, strip_attribute=strip_attribute,
+                                                strip_namespace=strip_namespace, strip_whitespace=strip_whitespace))
+
+    # the records are parsed using the same (ElementTree) parser as xml_to_json()
+    return iterfind_serialized(source, xpath, serialize, iterparse=xml2json.ET.iterparse)
+
+
 # def etree_to_dict(t):
 #     d = {t.tag: map(etree_to_dict, t.iterchildren())}
 #     d.update(('@' + k, v) for k, v in t.attrib.iteritems())
@@ -152,28 +216,20 @@ def xml_to_json(xmlstring, strip_attribute=False, strip_namespace=False, strip_w
 #     return d
 
 
-def element_info(element, tree=None):
+def element_info(element, tree=None, metrics=None):
     """
     Returns a dict with (incomplete) info about a specified element/node.
 
     :param element: an <ElementTree.Element> instance.
+    :param tree: optional. the tree containing the element. if it supports getpath(), the path will be included.
+    :param metrics: optional. a dict of precomputed metrics (as returned by elements_metrics()).
+        When info is needed for many elements of the same tree, passing this avoids re-walking each subtree.
     :return: a <collections.OrderedDict> instance.
-    """
-
-    def get_distinct_tag_names(elements):
-        # convert to tag names
-        elements = [child.tag for child in elements]
-        # filter out duplicates
-        elements = set(elements)
-        return elements
-
-    def get_distinct_attribute_names(elements):
-        names = set()
-        for i in elements:
-            names.update(i.attrib.keys())
-        names = ('@' + k for k in names)
-        return names
 
+    >>> root = load('<a><b x="1"><c/></b><b/></a>')
+    >>> sorted(element_info(root)['metrics']['descendants'].items())
+    [('attributes', ['@x']), ('count', 3), ('tags', ['b', 'c'])]
+    """
     d = OrderedDict()
 
     if tree:
@@ -185,9 +241,100 @@ def element_info(element, tree=None):
             # see: http://stackoverflow.com/a/13352109
             pass
 
-    d2 = {'tag': element.tag}
+    d['content'] = element_content(element)
+
+    d['metrics'] = {}
+
+    if metrics is None or element not in metrics:
+        metrics = elements_metrics(element)
+    summary = metrics[element]
+
+    if summary:
+        children, descendants = summary
+        d['metrics']['children'] = _metrics_info(children)
+        d['metrics']['descendants'] = _metrics_info(descendants)
+    return d
+
+
+def elements_metrics(root):
+    """
+    Computes the children and descendants metrics (i.e. count, distinct tags and distinct attribute names)
+    of every element in a tree, using a single (non-recursive) post-order traversal.
+
+    Each element's summary is merged into its parent's summary, so the whole tree is walked only once
+    (instead of once per element).
+
+    :param root: the root element of the (sub)tree.
+    :return: a dict that maps each element to a (children, descendants) tuple of raw metrics,
+        or to None if the element has no child elements.
+
+    >>> root = load('<a><b x="1"><c/></b><b/></a>')
+    >>> children, descendants = elements_metrics(root)[root]
+    >>> children['count'], sorted(children['tags']), descendants['count'], sorted(descendants['tags'])
+    (2, ['b'], 3, ['b', 'c'])
+    """
+    results = {}
+    stack = [(root, False)]
+    while stack:
+        element, visited = stack.pop()
+        if not visited:
+            stack.append((element, True))
+            stack.extend((child, False) for child in element if is_element(child))
+            continue
+        # Note: leaf elements are mapped to None, which avoids allocating (empty) metrics for the majority of elements
+        summary = None
+        for child in element:
+            if not is_element(child):
+                continue
+            if summary is None:
+                summary = (_new_metrics(), _new_metrics())
+            _add_metrics(summary[0], child)
+            _add_metrics(summary[1], child, results[child] and results[child][1])
+        results[element] = summary
+    return results
+
+
+def _new_metrics():
+    return {'count': 0, 'tags': set(), 'attributes': set()}
+
+
+def _add_metrics(metrics, element, descendants=None):
+    """
+    Adds an element (and, optionally, the raw descendants metrics of that element) to a raw metrics summary.
+    """
+    metrics['count'] += 1
+    metrics['tags'].add(element.tag)
+    metrics['attributes'].update(element.attrib.keys())
+    if descendants:
+        metrics['count'] += descendants['count']
+        metrics['tags'].update(descendants['tags'])
+        metrics['attributes'].update(descendants['attributes'])
+
+
+def _metrics_info(metrics):
+    """
+    Converts a raw metrics summary into the (JSON-friendly) format used by element_info().
+    """
+    return {
+        'count': metrics['count'],
+        'tags': sorted(metrics['tags']),
+        'attributes': sorted('@' + k for k in metrics['attributes'])
+    }
+
+
+def element_content(element):
+    """
+    Returns a dict describing the content (i.e. tag, text and attributes) of a specified element/node.
+
+    :param element: an <ElementTree.Element> instance.
+    :return: a dict.
+
+    >>> sorted(element_content(load('<a x="1">hi</a>')).items())
+    [('#text', 'hi'), ('attributes', OrderedDict([('@x', '1')])), ('tag', 'a')]
+    """
+    d = {'tag': element.tag}
     if element.text:
-        d2.update({'#text': element.text})
+        d.update({'#text': element.text})
     if element.attrib:
         # get all attribs
         attribs = element.attrib.items()
@@ -198,31 +345,72 @@ def element_info(element, tree=None):
         # if attribs:
         #     # d['attribs'] = {'tags': attribs, 'count': attribs_count}
         #     d['attribs'] = attribs
-        d2.update({'attributes': attribs})
-    d['content'] = d2
+        d.update({'attributes': attribs})
+    return d
 
-    d['metrics'] = {}
 
-    # get all direct children
-    children = get_elements(element, xpath='./*')
-    children_count = len(children)
-
-    if children_count:
-        d2 = {'count': children_count}
-        d2.update({'tags': (sorted(get_distinct_tag_names(children)))})
-        d2.update({'attributes': (sorted(get_distinct_attribute_names(children)))})
-        d['metrics']['children'] = d2
-
-    # get all descendants
-    descendants = get_elements(element, xpath='.//*')
-    descendants_count = len(descendants)
-
-    if descendants_count:
-        d2 = {'count': descendants_count}
-        d2.update({'tags': (sorted(get_distinct_tag_names(descendants)))})
-        d2.update({'attributes': (sorted(get_distinct_attribute_names(descendants)))})
-        d['metrics']['descendants'] = d2
-    return d
+def iter_elements_info(source):
+    """
+    Incrementally parses XML and yields an element_info()-style dict for each element, as soon as that element closes.
+
+    Unlike element_info(), this never builds the full tree. Each element (and its subtree) is discarded as soon as
+    its info has been yielded, so memory usage is constant apart from the current ancestor path.
+
+    Note: The elements are yielded in document order of their end tags (i.e. children before their parents).
+    Also, since the following siblings of an element are not yet known when it closes, every path step
+    (except for the root) includes a positional predicate (e.g. '/a/b[2]/c[1]').
+
+    :param source: a file-like object (or file path) containing the XML.
+    :return: an iterable of <collections.OrderedDict> instances.
+
+    >>> from io import BytesIO
+    >>> [i['path'] for i in iter_elements_info(BytesIO(b'<a><b><c/></b><b x="1"/></a>'))]
+    ['/a/b[1]/c[1]', '/a/b[1]', '/a/b[2]', '/a']
+
+    >>> items = list(iter_elements_info(BytesIO(b'<a><b><c/></b><b x="1"/></a>')))
+    >>> sorted(items[-1]['metrics']['children'].items())
+    [('attributes', ['@x']), ('count', 2), ('tags', ['b'])]
+    >>> sorted(items[-1]['metrics']['descendants'].items())
+    [('attributes', ['@x']), ('count', 3), ('tags', ['b', 'c'])]
+    """
+
+    # each stack entry holds the state of an open (i.e. started but not yet ended) ancestor element
+    stack = []
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if stack:
+                parent = stack[-1]
+                position = parent['positions'].get(element.tag, 0) + 1
+                parent['positions'][element.tag] = position
+                path = '{parent}/{tag}[{position}]'.format(parent=parent['path'], tag=element.tag, position=position)
+            else:
+                path = '/' + element.tag
+            stack.append({'element': element, 'path': path, 'positions': {},
+                          'children': _new_metrics(), 'descendants': _new_metrics()})
+            continue
+
+        frame = stack.pop()
+        d = OrderedDict()
+        d['path'] = frame['path']
+        d['content'] = element_content(element)
+        d['metrics'] = {}
+        if frame['children']['count']:
+            d['metrics']['children'] = _metrics_info(frame['children'])
+        if frame['descendants']['count']:
+            d['metrics']['descendants'] = _metrics_info(frame['descendants'])
+
+        if stack:
+            # merge this element's summary into its parent's summary
+            parent = stack[-1]
+            _add_metrics(parent['children'], element)
+            _add_metrics(parent['descendants'], element, frame['descendants'])
+
+        # free the finished subtree
+        element.clear()
+        if stack:
+            stack[-1]['element'].remove(element)
+
+        yield d
 
 
 def is_empty_element(elem):
@@ -236,6 +424,19 @@ def is_empty_element(elem):
     return not bool(len(elem) or elem.attrib or elem.text)
 
 
+def is_element(obj):
+    """
+    Indicates whether a tree node is an actual element (i.e. not a comment, processing instruction, etc.).
+
+    :param obj: a tree node object
+    :return: True if obj is an element
+
+    >>> [is_element(i) for i in load('<a><!-- c --><b/></a>').iter()]
+    [True, False, True]
+    """
+    return isinstance(obj.tag, string_types)
+
+
 def is_parent_element(elem):
     """
     Indicates whether an XML Element object has any children.
@@ -246,6 +447,67 @@ def is_parent_element(elem):
     return len(elem)
 
 
+def compile_xpath(xpath):
+    """
+    Returns a compiled XPath expression (i.e. an <lxml.etree.XPath> instance) for a specified XPath string.
+
+    Compiled expressions are kept in a bounded LRU cache (see XPATH_CACHE_SIZE),
+    so repeated evaluations of the same expression don't recompile it each time.
+
+    Note: This function requires lxml. Without lxml, it raises an AttributeError.
+
+    :param xpath: an XPath expression string.
+    :return: a callable that evaluates the expression against a tree or element.
+
+    >>> compile_xpath('count(//b)') is compile_xpath('count(//b)')
+    True
+    """
+    try:
+        compiled = _xpath_cache.pop(xpath)
+        _xpath_cache_stats['hits'] += 1
+    except KeyError:
+        # Note: raises AttributeError if lxml is not available (ElementTree has no XPath class)
+        compiled = ET.XPath(xpath)
+        _xpath_cache_stats['misses'] += 1
+        if len(_xpath_cache) >= XPATH_CACHE_SIZE:
+            # evict the least recently used expression
+            _xpath_cache.popitem(last=False)
+    # (re)insert the expression as the most recently used one
+    _xpath_cache[xpath] = compiled
+    return compiled
+
+
+def xpath_cache_info():
+    """
+    Returns statistics about the compile_xpath() cache.
+
+    :return: a dict.
+
+    >>> sorted(xpath_cache_info().keys())
+    ['hits', 'maxsize', 'misses', 'size']
+    """
+    d = {'maxsize': XPATH_CACHE_SIZE, 'size': len(_xpath_cache)}
+    d.update(_xpath_cache_stats)
+    return d
+
+
+def evaluate_xpath(obj, xpath):
+    """
+    Evaluates an XPath expression against a tree or element, using a cached compiled expression.
+
+    :param obj: an lxml tree or element object
+    :param xpath: an XPath expression
+    :return: the result of the evaluation.
+    :raises AttributeError: if obj is not an lxml object (e.g. ElementTree objects don't support XPath).
+
+    >>> evaluate_xpath(load('<a><b/><b/></a>'), 'count(//b)')
+    2.0
+    """
+    if not hasattr(obj, 'xpath'):
+        raise AttributeError("'%s' object has no attribute 'xpath'" % type(obj).__name__)
+    return compile_xpath(xpath)(obj)
+
+
 def count_elements(obj, xpath=None):
     """
     Returns a count of the XML elements that match a specified XPath expression.
@@ -261,7 +523,7 @@ def count_elements(obj, xpath=None):
 
     # try lxml syntax first (much faster!)
     try:
-        return int(obj.xpath('count({xpath})'.format(xpath=xpath)))
+        return int(evaluate_xpath(obj, 'count({xpath})'.format(xpath=xpath)))
     except AttributeError:
         # AttributeError: 'ElementTree' object has no attribute 'xpath'
         pass
@@ -289,7 +551,7 @@ def get_elements(obj, xpath=None):
 
     # try lxml syntax first (much faster!)
     try:
-        return obj.xpath(xpath)
+        return evaluate_xpath(obj, xpath)
     except AttributeError:
         # AttributeError: 'ElementTree' object has no attribute 'xpath'
         pass
@@ -302,6 +564,138 @@ def get_elements(obj, xpath=None):
     return obj.findall(xpath)
 
 
+def parse_simple_xpath(xpath):
+    """
+    Parses a 'simple' absolute XPath location path (i.e. one that can be evaluated while streaming).
+
+    A simple path consists only of '/' (child) and '//' (descendant) steps with plain (unprefixed) tag names or '*'.
+    Paths that use predicates, functions or other axes (e.g. '//b[last()]', '//d/e/parent::*')
+    need global context, and are therefore not considered simple.
+
+    :param xpath: an XPath expression string.
+    :return: a list of (axis, name) tuples, where axis is '/' or '//'. Or None if xpath is not simple.
+
+    >>> parse_simple_xpath('//record')
+    [('//', 'record')]
+
+    >>> parse_simple_xpath(' /a/b//*')
+    [('/', 'a'), ('/', 'b'), ('//', '*')]
+
+    >>> parse_simple_xpath('//b[1]') is None, parse_simple_xpath('b') is None, parse_simple_xpath('//x:b') is None
+    (True, True, True)
+    """
+    xpath = xpath.strip() if xpath else xpath
+    if not xpath or not re.match(r'^(?://?(?:\*|[A-Za-z_][\w.\-]*))+$', xpath):
+        return None
+    return re.findall(r'(//?)([^/]+)', xpath)
+
+
+def iterfind_tostring(source, xpath):
+    """
+    Incrementally parses XML, yielding the serialized form (i.e. ET.tostring()) of each element that matches
+    a simple XPath location path (see parse_simple_xpath()), without building the full tree.
+
+    See iterfind_serialized() for details.
+
+    :param source: a file-like object (or file path) containing the XML.
+    :param xpath: a simple XPath location path.
+    :return: an iterable of serialized elements.
+
+    >>> from io import BytesIO
+    >>> list(iterfind_tostring(BytesIO(b'<a><b><c/></b><b><d><e/></d><d/></b></a>'), '//b/d'))
+    ['<d><e/></d>', '<d/>']
+
+    >>> list(iterfind_tostring(BytesIO(b'<a><b>1<b>2</b>t</b>x</a>'), '//b'))
+    ['<b>1<b>2</b>t</b>x', '<b>2</b>t']
+
+    >>> list(iterfind_tostring(BytesIO(b'<a/>'), '//b[1]'))
+    Traceback (most recent call last):
+    ValueError: unsupported (non-simple) XPath expression: //b[1]
+    """
+    return iterfind_serialized(source, xpath, ET.tostring)
+
+
+def iterfind_serialized(source, xpath, serialize, iterparse=None):
+    """
+    Incrementally parses XML, yielding the serialized form of each element that matches
+    a simple XPath location path (see parse_simple_xpath()), without building the full tree.
+
+    Matches are serialized (and yielded) in document order, as soon as they (and their tail text) have been parsed.
+    Each finished subtree is then discarded, so memory usage is bounded by the current ancestor path
+    (plus the size of the largest matching subtree).
+
+    :param source: a file-like object (or file path) containing the XML.
+    :param xpath: a simple XPath location path.
+    :param serialize: a function which accepts a (complete) matching element, and returns its serialized form.
+    :param iterparse: the iterparse() function to use. Defaults to that of the ET package (e.g. lxml).
+    :return: an iterable of serialized elements.
+
+    >>> from io import BytesIO
+    >>> list(iterfind_serialized(BytesIO(b'<a><b id="1"/><c><b id="2"/></c></a>'), '//b', lambda e: e.get('id')))
+    ['1', '2']
+    """
+    steps = parse_simple_xpath(xpath)
+    if steps is None:
+        raise ValueError('unsupported (non-simple) XPath expression: %s' % xpath)
+    final_state = len(steps)
+
+    def advance(states, tag):
+        # determine which steps of the path have been matched once an element with the specified tag is entered
+        result = set()
+        for i in states:
+            if i == final_state:
+                continue
+            axis, name = steps[i]
+            if axis == '//':
+                # a descendant step may still be matched by a deeper element
+                result.add(i)
+            if name == '*' or name == tag:
+                result.add(i + 1)
+        return result
+
+    def free(element, parent):
+        element.clear()
+        if parent is not None:
+            parent.remove(element)
+
+    # each stack entry holds an open (i.e. started but not yet ended) ancestor element and its matching states
+    stack = []
+    # the matching elements (in document order) within the currently open outermost matching element
+    pending = []
+    # a closed outermost match (and its parent), awaiting the parsing of its tail
+    finished = None
+    if iterparse is None:
+        iterparse = ET.iterparse
+    for event, element in iterparse(source, events=('start', 'end')):
+        if finished is not None:
+            # the parser has moved past the tail of the finished match, so it can now be serialized
+            for i in pending:
+                yield serialize(i)
+            pending = []
+            free(*finished)
+            finished = None
+
+        if event == 'start':
+            states = advance(stack[-1][1] if stack else (0,), element.tag)
+            if final_state in states:
+                pending.append(element)
+            stack.append((element, states))
+            continue
+
+        stack.pop()
+        parent = stack[-1][0] if stack else None
+        if not pending:
+            # neither a match nor inside a match
+            free(element, parent)
+        elif pending[0] is element:
+            finished = (element, parent)
+
+    if finished is not None:
+        for i in pending:
+            yield serialize(i)
+        free(*finished)
+
+
 def remove_elements(obj, xpath):
     """
     Removes all XML elements that match a specified XPath expression.
@@ -1,5 +1,4 @@
 import itertools
-import json
 import logging
 import sys
 from pprint import pformat
@@ -8,6 +7,8 @@ import click
 
 from clifunzone import click_utils
 from clifunzone import dict_utils
+from clifunzone import input_utils
+from clifunzone import json_utils
 from clifunzone import xml_utils
 from clifunzone.reflection_utils import varsdict
 
@@ -41,14 +42,29 @@ def debug_context(**kwargs):
         click.echo('subcommand: %s' % subcommand)
 
 
-@click.group(context_settings=click_utils.CONTEXT_SETTINGS, invoke_without_command=True)
+@click.group(cls=click_utils.MultiInputGroup, context_settings=click_utils.CONTEXT_SETTINGS,
+             invoke_without_command=True)
 @click.version_option(version='1.0.0')
 @click.option('--debug/--silent', '-d/-s', 'debug', default=False)
 # @click.option('--debug', '-d', 'debug', flag_value=True, default=True)
 # @click.option('--silent', '-s', 'debug', flag_value=False)
-def cli(debug):
+@click.option('--inputs', '-I', multiple=True, type=click.STRING,
+              help='an input file, directory or glob pattern. may be repeated.'
+                   ' causes the subcommand to be run once per input file (see --jobs).')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=1,
+              help='the number of processes used to run the subcommand for multiple --inputs. Default is 1.')
+def cli(debug, inputs, jobs):
     """
     Provides CLI commands for interacting with XML data/files.
+
+    With --inputs, the subcommand is run once per input file (using up to --jobs parallel processes).
+    The output for each file is preceded by a '==> path <==' header (in input order),
+    and any per-file failures are reported in a summary at the end.
+
+    Examples:
+
+        \b
+        $ python -mclifunzone.xmltool -I 'data/*.xml' -j 4 tojson -sws
     """
     ctx = click.get_current_context()
     if debug:
@@ -67,6 +83,10 @@ def cli(debug):
     except:
         logging.exception('debug_context error')
 
+    if debug and subcommand is not None:
+        # report the XPath cache statistics once the subcommand has finished
+        ctx.call_on_close(lambda: click.echo('xpath cache: %s' % xml_utils.xpath_cache_info()))
+
 
 @cli.command(short_help='echo the unparsed input')
 @click.option('--input', '-i', type=click.Path(exists=True, dir_okay=False, allow_dash=True),
@@ -75,11 +95,7 @@ def echo(input, **kwargs):
     """
     Echo the (unparsed) input.
     """
-    if not input:
-        input = '-'
-    with click.open_file(input, mode='rb') as f:
-        s = f.read()
-        click.echo(s)
+    click_utils.echo_chunks(input_utils.iter_chunks(input))
 
 
 @cli.command(short_help='validate the input')
@@ -126,11 +142,11 @@ def parse(input, pyformat, sort_keys, **kwargs):
         xmlstring = f.read()
         output = xml_utils.xml_to_json(xmlstring, strip_whitespace=False, strip_namespace=False, strip_attribute=False,
                                        pretty=True)
-        d = json.loads(output)
+        d = json_utils.loads(output)
         if pyformat:
             s = pformat(d)
         else:
-            s = json.dumps(d, indent=2, sort_keys=sort_keys)
+            s = json_utils.dumps(d, indent=2, sort_keys=sort_keys)
         click.echo(s)
 
 
@@ -166,7 +182,7 @@ def info(input, verbose, pyformat, **kwargs):
         if pyformat:
             s = pformat(d)
         else:
-            s = json.dumps(d, indent=2, sort_keys=True)
+            s = json_utils.dumps(d, indent=2, sort_keys=True)
         click.echo(s)
 
 
@@ -182,25 +198,52 @@ def info(input, verbose, pyformat, **kwargs):
               help='causes XML namespaces to be ignored.')
 @click.option('--stripattribute', '-sa', 'strip_attribute', is_flag=True, default=False,
               help='causes XML attributes to be ignored.')
-def tojson(input, pretty, echo, strip_whitespace, strip_namespace, strip_attribute, **kwargs):
+@click.option('--records', '-r', 'records_xpath', type=click.STRING,
+              help='a simple XPath location path (e.g. //record). causes each matching element to be output'
+                   ' as a separate line of JSON (i.e. NDJSON). not compatible with --pretty.')
+def tojson(input, pretty, echo, strip_whitespace, strip_namespace, strip_attribute, records_xpath, **kwargs):
     """
     Converts the XML input to JSON output. Requires valid input.
+
+    Note: With --records, the input is processed as a stream,
+    so each record is output as soon as it has been parsed (and is then discarded).
+
+    Examples:
+
+        \b
+        $ echo '<rs><r id="1"/><r>x</r></rs>' | python -mclifunzone.xmltool tojson -r //r
+        {"r": {"@id": "1"}}
+        {"r": "x"}
     """
+    if records_xpath and pretty:
+        raise ValueError('"records" mode does not support the "pretty" format.')
     # output = xml2json.json2xml(input)
 
+    def convert(f):
+        if records_xpath:
+            records = xml_utils.iter_xml_records_to_json(f, records_xpath, strip_whitespace=strip_whitespace,
+                                                         strip_namespace=strip_namespace,
+                                                         strip_attribute=strip_attribute)
+            click_utils.echo_chunks((record + '\n' for record in records), nl=False)
+            return
+        # the JSON is written as it is encoded (i.e. without building an intermediate dict or string)
+        chunks = xml_utils.iter_xml_to_json(f, strip_whitespace=strip_whitespace, strip_namespace=strip_namespace,
+                                            strip_attribute=strip_attribute, pretty=pretty)
+        # output = xml2json.elem2json(dom, options=options, strip_ns=None, strip=None)
+        # click.echo('\nJSON:\n{}\n'.format(output))
+        click_utils.echo_chunks(chunks)
+
     if not input:
         input = '-'
     with click.open_file(input, mode='rb') as f:
-        xmlstring = f.read()
         if echo:
-            click.echo('\nXML:')
-            click.echo(xmlstring)
-            click.echo('\nJSON:')
-    output = xml_utils.xml_to_json(xmlstring, strip_whitespace=strip_whitespace, strip_namespace=strip_namespace,
-                                   strip_attribute=strip_attribute, pretty=pretty)
-    # output = xml2json.elem2json(dom, options=options, strip_ns=None, strip=None)
-    # click.echo('\nJSON:\n{}\n'.format(output))
-    click.echo(output)
+            with input_utils.map_file(f) as buf:
+                click.echo('\nXML:')
+                click_utils.echo_chunks(input_utils.iter_buffer_chunks(buf))
+                click.echo('\nJSON:')
+                convert(input_utils.as_file(buf))
+        else:
+            convert(f)
 
 
 @cli.command(short_help='outputs info about every element in the input')
@@ -209,10 +252,16 @@ def tojson(input, pretty, echo, strip_whitespace, strip_namespace, strip_attribu
 @click.option('--verbose', '-v', is_flag=True, type=click.BOOL,
               help='enables more detailed output.')
 @click.option('--pretty', '-p', is_flag=True, default=False, help='pretty format')
-def elements(input, verbose, pretty, **kwargs):
+@click.option('--stream', is_flag=True, type=click.BOOL,
+              help='parses the input incrementally, outputting each element (as a line) as soon as it closes.'
+                   ' uses constant memory (apart from the current ancestor path). not compatible with --pretty.')
+def elements(input, verbose, pretty, stream, **kwargs):
     """
     Prints information about each element (i.e. tag) in the input. Requires valid input.
 
+    Note: With --stream, the elements are output in the order that they close (i.e. children before parents),
+    and every path step (except for the root) includes a positional predicate.
+
     Examples:
 
         \b
@@ -223,31 +272,50 @@ def elements(input, verbose, pretty, **kwargs):
         $ echo '<a><b><c/></b><b><d><e/></d><d/></b></a>' | python -mclifunzone.xmltool elements | head -n 1
         {"path":"/a","content":{"tag":"a"},"metrics":{"children":{"count":2,"tags":["b"]},\\
         "descendants":{"count":6,"tags":["b","c","d","e"]}}}
+
+        \b
+        $ echo '<a><b><c/></b><b><d><e/></d><d/></b></a>' | python -mclifunzone.xmltool elements --stream | head -n 1
+        {"path":"/a/b[1]/c[1]","content":{"tag":"c"}}
     """
+
+    # remove 'noise' from the data output to make it more understandable/readable/concise
+    # (the steps are applied in a single traversal of each item)
+    simplify = (dict_utils.Pipeline()
+                .remove_if(lambda k, v: v == '\n')
+                .remove_if(lambda k, v: v == '')
+                .remove_if(lambda k, v: v is None)
+                .remove_if(lambda k, v: v == [])
+                .remove_if(lambda k, v: v == {})
+                .apply)
+
+    if stream and pretty:
+        raise ValueError('"stream" mode does not support the "pretty" format.')
+
     if not input:
         input = '-'
     with click.open_file(input, mode='rb') as f:
+        if stream:
+            for i in xml_utils.iter_elements_info(f):
+                if not verbose:
+                    i = simplify(i)
+                click.echo(json_utils.dumps(i, indent=None, separators=(',', ':')))
+            return
+
         tree = ET.parse(f)
         root = tree.getroot()
         tag = None  # 'div' or whatever
         items = root.iter(tag=tag) if tag else root.iter()
         # items = [i for i in items]
-        items = [xml_utils.element_info(i, tree=tree) for i in items]
+        # compute the metrics of every element in a single pass (instead of re-walking each element's subtree)
+        metrics = xml_utils.elements_metrics(root)
+        items = [xml_utils.element_info(i, tree=tree, metrics=metrics) for i in items]
         if not verbose:
-            # remove 'noise' from the data output to make it more understandable/readable/concise
-            # items = [dict_utils.map_values(i, lambda v: '' if v == '\n' else v) for i in items]
-            items = [dict_utils.remove_if(i, lambda k, v: v == '\n', output=True) for i in items]
-            items = [dict_utils.remove_if(i, lambda k, v: v == '', output=True) for i in items]
-            items = [dict_utils.remove_if(i, lambda k, v: v is None, output=True) for i in items]
-            items = [dict_utils.remove_if(i, lambda k, v: v == [], output=True) for i in items]
-            items = [dict_utils.remove_if(i, lambda k, v: v == {}, output=True) for i in items]
-            # items = [dict_utils.filter_none_values(i) for i in items]
-            # items = [dict_utils.filter_empty_values(i) for i in items]
+            items = [simplify(i) for i in items]
         if pretty:
-            output = json.dumps(items, indent=4)
+            output = json_utils.dumps(items, indent=4)
             click.echo(output)
         else:
-            lines = [json.dumps(i, indent=None, separators=(',', ':')) for i in items]
+            lines = [json_utils.dumps(i, indent=None, separators=(',', ':')) for i in items]
             for line in lines:
                 click.echo(line)
 
@@ -383,6 +451,10 @@ def find(input, xpaths, root_tag, no_root, **kwargs):
     Note: The ElementTree package (Python builtin) has limited XPath support.
     Therefore, some of the examples below will only work if the lxml package is used (instead of ElementTree).
 
+    Note: If a single, 'simple' XPath location path is specified (e.g. '//record', '/a/b/c' or '//b//*'),
+    the input is processed as a stream (i.e. each match is output as soon as it has been parsed).
+    Other expressions (e.g. those with predicates, functions or non-child axes) require the full tree to be built.
+
     Examples:
 
         \b
@@ -479,28 +551,34 @@ def find(input, xpaths, root_tag, no_root, **kwargs):
         <a>7a3</a>
     """
 
+    if no_root:
+        root_tag = None
+    if root_tag:
+        header = '<%s>' % root_tag
+        footer = '</%s>' % root_tag
+    else:
+        header, footer = None, None
+
     if not input:
         input = '-'
     with click.open_file(input, mode='rb') as f:
-        tree = ET.parse(f)
-        root = tree.getroot()
-        if xpaths:
-            elements = list(itertools.chain(*(xml_utils.get_elements(root, xpath=xpath) for xpath in xpaths)))
-        else:
-            elements = []
-        # output = ET.tostring(root, method='text')
-        if no_root:
-            root_tag = None
-        if root_tag:
-            header = '<%s>' % root_tag
-            footer = '</%s>' % root_tag
+        if len(xpaths) == 1 and xml_utils.parse_simple_xpath(xpaths[0]):
+            # simple location paths (e.g. '//record' or '/a/b/c') can be matched while parsing,
+            # so each match is output (and freed) without building the full tree
+            outputs = xml_utils.iterfind_tostring(f, xpaths[0])
         else:
-            header, footer = None, None
+            tree = ET.parse(f)
+            root = tree.getroot()
+            if xpaths:
+                elements = list(itertools.chain(*(xml_utils.get_elements(root, xpath=xpath) for xpath in xpaths)))
+            else:
+                elements = []
+            # output = ET.tostring(root, method='text')
+            outputs = (ET.tostring(i) for i in elements)
 
         if header:
             click.echo(header)
-        for i in elements:
-            output = ET.tostring(i)
+        for output in outputs:
             click.echo(output)
         if footer:
             click.echo(footer)
@@ -103,6 +103,9 @@ def assert_out_contains(actual, expected, encode=True, sequential=False):
             # pos += len(s)
     else:
         for s in expected:
+            if encode:
+                if s is not None:
+                    s = s.encode()
             assert s in actual
 
 
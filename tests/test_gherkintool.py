@@ -162,3 +162,14 @@ def test_info_invalid_input(input_text):
                     reason="currently broken for py35")
 def test_info_fragments(input_text, cli_args, expected):
     clirunner_invoke_piped(sut.info, cli_args, input_text, exit_code=0, out_contains_seq=expected)
+
+
+def test_info_metrics():
+    input_text = 'Feature: abc\nScenario: def\nGiven a\nAnd b\nScenario: ghi\nGiven c\n'
+    expected = [
+        '"Scenarios": [', '"def"', '"ghi"',
+        '"Steps": [', '"a"', '"b"', '"c"',
+        '"Keywords": {', '"And ": 1', '"Feature": 1', '"Given ": 2', '"Scenario": 2',
+        '"Types": {', '"Feature": 1', '"Scenario": 2', '"Step": 3',
+    ]
+    clirunner_invoke_piped(sut.info, [], input_text, exit_code=0, out_contains_seq=expected)
@@ -1,11 +1,27 @@
+import glob
+import os
 import sys
+from io import BytesIO
 
 import pytest
 from click_testing_utils import clirunner_invoke_piped
 
+from clifunzone import dict_utils
+from clifunzone import json_utils
 import clifunzone.jsontool as sut
 
 
+def get_json_error_name(s):
+    """
+    :return: the name of the error type raised when decoding invalid JSON (e.g. JSONDecodeError, on py3).
+    """
+    try:
+        json_utils.loads(s)
+    except ValueError as e:
+        return type(e).__name__
+    raise AssertionError('valid JSON: %s' % s)
+
+
 def test_none():
     expected = 'I was invoked without a subcommand...'
     clirunner_invoke_piped(sut.cli, [], '', exit_code=0, out_ok=expected)
@@ -23,7 +39,7 @@ def test_none_debug():
         " 'args': [],",
         " 'auto_envvar_prefix': None,",
         " 'color': None,",
-        " 'command': <click.core.Group object at 0x10c6d5ed0>,",
+        " 'command': <clifunzone.click_utils.MultiInputGroup object at 0x10c6d5ed0>,",
         " 'default_map': None,",
         " 'help_option_names': ['-h', '--help'],",
         " 'ignore_unknown_options': False,",
@@ -31,7 +47,11 @@ def test_none_debug():
         " 'invoked_subcommand': None,",
         " 'max_content_width': None,",
         " 'obj': None,",
-        " 'params': {'debug': True},",
+        " 'params': {'debug': True,",
+        "            'inputs': (),",
+        "            'jobs': 1,",
+        "            'ndjson': None,",
+        "            'skip_invalid': None},",
         " 'parent': None,",
         " 'protected_args': [],",
         " 'resilient_parsing': False,",
@@ -50,7 +70,7 @@ def test_none_debug():
         " 'args': [],",
         " 'auto_envvar_prefix': None,",
         " 'color': None,",
-        " 'command': <click.core.Group object at 0x10c6d5ed0>,",
+        " 'command': <clifunzone.click_utils.MultiInputGroup object at 0x10c6d5ed0>,",
         " 'default_map': None,",
         " 'help_option_names': ['-h', '--help'],",
         " 'ignore_unknown_options': False,",
@@ -58,7 +78,11 @@ def test_none_debug():
         " 'invoked_subcommand': None,",
         " 'max_content_width': None,",
         " 'obj': None,",
-        " 'params': {'debug': True},",
+        " 'params': {'debug': True,",
+        "            'inputs': (),",
+        "            'jobs': 1,",
+        "            'ndjson': None,",
+        "            'skip_invalid': None},",
         " 'parent': None,",
         " 'protected_args': [],",
         " 'resilient_parsing': False,",
@@ -196,14 +220,207 @@ def test_format(input_text, cli_args, expected):
     clirunner_invoke_piped(sut.formatcommand, cli_args, input_text, exit_code=0, out_eq=expected)
 
 
+@pytest.mark.parametrize("backend", list(json_utils.get_backends()))
+@pytest.mark.parametrize("cli_args", [[], ['--compact'], ['--pretty'], ['--flat'], ['-c', '-s']])
+def test_format_backends(backend, cli_args):
+    input_text = '{"a":"A\\u00e9","b":1.5,"n":{"c":null,"e":NaN},"d":[]}'
+    try:
+        json_utils.set_backend('json')
+        expected = clirunner_invoke_piped(sut.formatcommand, cli_args, input_text, exit_code=0).output
+        json_utils.set_backend(backend)
+        clirunner_invoke_piped(sut.formatcommand, cli_args, input_text, exit_code=0, out_eq=expected[:-1])
+    finally:
+        json_utils.set_backend()
+
+
+@pytest.mark.parametrize("input_text,expected", [
+    ('{"root": [{"b": 1, "a": [2.5, null]}, "x", 1e3]}', '{"root": [\n\n{"b":1,"a":[2.5,null]}\n,\n"x"\n,\n1000.0\n]}'),
+    (' {"items" : [ ] }\n', '{"items": [\n\n\n]}'),
+    ('{"root": {"a": [1], "b": 2}}', '{"root": [\n\n"a"\n,\n"b"\n]}'),
+])
+def test_format_lines(input_text, expected):
+    clirunner_invoke_piped(sut.formatcommand, ['--lines'], input_text, exit_code=0, out_eq=expected)
+
+
+@pytest.mark.parametrize("input_text", [
+    '[1, 2]',
+    '{}',
+    '{"root": 1}',
+    '{"root": [1, 2]',
+    '{"root": [1, 2], "other": []}',
+])
+def test_format_lines_invalid_input(input_text):
+    clirunner_invoke_piped(sut.formatcommand, ['--lines'], input_text, exit_code=-1)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_iterload_root_items_chunks(chunk_size):
+    items = [1, -2.5e+10, 123456789, 'a\\"b\u00e9', True, False, None, [], {}, {'a': [1, {'b': None}], 'c': 'x y'}, 0.001]
+    fp = BytesIO(json_utils.dumps({'root': items * 2}).encode('utf-8'))
+    root, actual = json_utils.iterload_root_items(fp, chunk_size=chunk_size)
+    assert list(actual) == items * 2
+
+
+@pytest.mark.parametrize("item", ['x', '[1 2]', '{"a" 1}', 'tru e', '"a" "b"', '{"a": [1, }', '-x'])
+def test_iterload_root_items_invalid_item(item):
+    # i.e. an invalid item is reported without reading the rest of the input
+    fp = BytesIO(('{"root": [1, %s, ' % item + '2, ' * 10000 + '3]}').encode('utf-8'))
+    root, items = json_utils.iterload_root_items(fp, chunk_size=16)
+    with pytest.raises(ValueError):
+        list(items)
+    assert fp.tell() < 1000
+
+
 @pytest.mark.parametrize("input_text,cli_args,expected", [
     ('{"a":"A","b":1,"n":{"c":null},"d":[]}', [], '{"a": "A", "b": 1, "n__c": null, "d": []}'),
     ('{"a":"A","b":1,"n":{"c":null},"d":[]}', ['--compact'], '{"a":"A","b":1,"n__c":null,"d":[]}'),
     ('{"a":"A","b":1,"n":{"c":null},"d":[]}', ['--pretty'],
      '{\n  "a": "A", \n  "b": 1, \n  "n__c": null,\n  "d": []\n}'),
     ('{"a":"A","b":1,"n":{"c":null},"d":[]}', ['--flat'], '{\n"a": "A", \n"b": 1, \n"n__c": null,\n"d": []\n}'),
+    ('{"a":{"b":{"c":1},"d":[{"e":{}}]},"f":{}}', ['-c'], '{"a__b__c":1,"a__d":[{"e":{}}]}'),
+    ('{"a":{"b":{"c":1},"d":[{"e":{}}]},"f":{}}', ['-c', '-s', '.'], '{"a.b.c":1,"a.d":[{"e":{}}]}'),
+    ('{"b":{"x":1},"a":2}', ['-c', '--sort-keys'], '{"a":2,"b__x":1}'),
+    ('{"a":{}}', ['-p'], '{}'),
+    ('{"a":{"b":null,"c":[1,null]},"d":null}', ['-c', '-n'], '{"a__c":[1]}'),
 ])
 @pytest.mark.skipif(sys.version_info > (3, 3),
                     reason="currently broken for py35")
 def test_flatten(input_text, cli_args, expected):
     clirunner_invoke_piped(sut.flattencommand, cli_args, input_text, exit_code=0, out_eq=expected)
+
+
+@pytest.mark.parametrize("input_text,cli_args,expected", [
+    ('{"a":{"b":1},"a__b":2}', ['-c'], '{"a__b":2}'),
+    ('{"a__b":1,"c":3,"a":{"b":2}}', ['-c'], '{"a__b":2,"c":3}'),
+    ('{"a":{"b":1},"a.b":2}', ['-c'], '{"a__b":1,"a.b":2}'),
+])
+def test_flatten_duplicate_keys(input_text, cli_args, expected):
+    clirunner_invoke_piped(sut.flattencommand, cli_args, input_text, exit_code=0, out_eq=expected)
+
+
+SAMPLE_JSON_FILES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', 'resources', 'files', 'json', '*.json')))
+
+
+@pytest.mark.parametrize("input_text,cli_args,expected", [
+    ('{"a":"A","b":1,"n__c":null,"d":[]}', ['--compact'], '{"a":"A","b":1,"n":{"c":null},"d":[]}'),
+    ('{"a__b__c":1,"a__d":[{"e":{}}],"f":2}', ['-c'], '{"a":{"b":{"c":1},"d":[{"e":{}}]},"f":2}'),
+    ('{"a.b":1,"c":2,"a.d":3}', ['-c', '-s', '.'], '{"a":{"b":1,"d":3},"c":2}'),
+    ('{"b__x":1,"a":2}', ['-c', '--sort-keys'], '{"a":2,"b":{"x":1}}'),
+])
+def test_unflatten(input_text, cli_args, expected):
+    clirunner_invoke_piped(sut.unflattencommand, cli_args, input_text, exit_code=0, out_eq=expected)
+
+
+@pytest.mark.parametrize("input_text", [
+    '{"a":1,"a__b":2}',
+    '{"a__b":2,"a":1}',
+    '[1]',
+])
+def test_unflatten_invalid_input(input_text):
+    clirunner_invoke_piped(sut.unflattencommand, [], input_text, exit_code=-1)
+
+
+@pytest.mark.parametrize("path", SAMPLE_JSON_FILES, ids=os.path.basename)
+@pytest.mark.parametrize("separator", ['__', '/'])
+def test_unflatten_round_trip(path, separator):
+    with open(path, 'rb') as f:
+        try:
+            data = json_utils.load_ordered(f)
+        except ValueError:
+            pytest.skip('invalid JSON')
+    if not isinstance(data, dict):
+        pytest.skip('not a JSON object')
+    flat = dict_utils.flatten(data, separator)
+    assert list(flat.items()) == list(dict_utils.iter_flatten(data, separator))
+    assert dict_utils.unflatten(flat, separator) == data
+    assert json_utils.dumps(dict_utils.unflatten(flat, separator)) == json_utils.dumps(data)
+
+
+@pytest.mark.parametrize("input_text,cli_args,expected", [
+    ('{"a":{"b":null,"c":" x ","d":"","e":{"f":null},"g":{},"h":[null]}}', ['-c'],
+     '{"a":{"b":null,"c":" x ","d":"","e":{"f":null},"g":{},"h":[null]}}'),
+    ('{"a":{"b":null,"c":" x ","d":"","e":{"f":null},"g":{},"h":[null]}}', ['-c', '-n'],
+     '{"a":{"c":" x ","d":"","e":{},"g":{},"h":[]}}'),
+    ('{"a":{"b":null,"c":" x ","d":"","e":{"f":null},"g":{},"h":[null]}}', ['-c', '-e'],
+     '{"a":{"b":null,"c":" x ","e":{"f":null},"h":[null]}}'),
+    ('{"a":{"b":null,"c":" x ","d":"","e":{"f":null},"g":{},"h":[null]}}', ['-c', '-n', '-e'], '{"a":{"c":" x "}}'),
+    ('{"a":{"b":null,"c":" x ","d":" ","e":{"f":null},"g":{},"h":[null]}}', ['-c', '-t', '-n', '-e'], '{"a":{"c":"x"}}'),
+    ('[1,null]', ['-c'], '[1,null]'),
+])
+def test_strip(input_text, cli_args, expected):
+    clirunner_invoke_piped(sut.strip, cli_args, input_text, exit_code=0, out_eq=expected)
+
+
+@pytest.mark.parametrize("input_text,cli_args,expected", [
+    ('{"a": 1}\n{"b": 2}\n', [], '{"root": [\n{"a": 1},\n{"b": 2}\n]}'),
+    ('\n {"a": 1}\n\n', ['-r', 'items'], '{"items": [\n{"a": 1}\n]}'),
+    ('', [], '{"root": [\n\n]}'),
+])
+def test_mergelines(tmpdir, input_text, cli_args, expected):
+    clirunner_invoke_piped(sut.mergelines, cli_args, input_text, exit_code=0, out_eq=expected)
+    path = tmpdir.join('input.json')
+    path.write(input_text)
+    clirunner_invoke_piped(sut.mergelines, cli_args + ['-i', str(path)], exit_code=0, out_eq=expected)
+
+
+def test_mergelines_validate():
+    clirunner_invoke_piped(sut.mergelines, ['--validate'], '{"a": 1}\n[2]\n', exit_code=0,
+                           out_eq='{"root": [\n{"a": 1},\n[2]\n]}')
+    result = clirunner_invoke_piped(sut.mergelines, ['--validate'], '{"a": 1}\n{"b":\n', exit_code=-1)
+    assert str(result.exception) == 'invalid JSON fragment (#2): {"b":'
+
+
+@pytest.mark.parametrize("jobs", ['1', '2'])
+def test_multiple_inputs(tmpdir, jobs):
+    tmpdir.join('1.json').write('{"a": {"b": null}}')
+    tmpdir.join('2.json').write('{"a": ')
+    tmpdir.join('3.json').write('[1, 2]')
+    cli_args = ['-I', str(tmpdir), '-j', jobs, 'format', '-c']
+    expected = [
+        '==> %s <==\n{"a":{"b":null}}\n' % tmpdir.join('1.json'),
+        '==> %s <==\n' % tmpdir.join('2.json'),
+        '==> %s <==\n[1,2]\n' % tmpdir.join('3.json'),
+        'summary: 3 inputs, 2 succeeded, 1 failed',
+        'failed: %s: %s: ' % (tmpdir.join('2.json'), get_json_error_name('{"a": ')),
+    ]
+    clirunner_invoke_piped(sut.cli, cli_args, '', exit_code=1, out_contains_seq=expected)
+
+
+@pytest.mark.parametrize("cli_args,expected", [
+    (['parse'], '{"a": {"b": null, "c": 1}}\n{"d": []}'),
+    (['format', '-p'], '{"a": {"b": null, "c": 1}}\n{"d": []}'),
+    (['format', '-c'], '{"a":{"b":null,"c":1}}\n{"d":[]}'),
+    (['flatten', '-c'], '{"a__b":null,"a__c":1}\n{"d":[]}'),
+    (['unflatten', '-c'], '{"a":{"b":null,"c":1}}\n{"d":[]}'),
+    (['strip', '-n', '-c'], '{"a":{"c":1}}\n{"d":[]}'),
+    (['info'], '{"keys": ["a"], "length": 1}\n{"keys": ["d"], "length": 1}'),
+])
+def test_ndjson(cli_args, expected):
+    input_text = '{"a": {"b": null, "c": 1}}\n\n{"d": []}\n'
+    clirunner_invoke_piped(sut.cli, ['--ndjson'] + cli_args, input_text, exit_code=0, out_eq=expected)
+
+
+def test_ndjson_invalid():
+    input_text = '{"a": 1}\n{bad\n[1]\n{"b": 2}\n'
+    result = clirunner_invoke_piped(sut.cli, ['--ndjson', 'info'], input_text, exit_code=-1)
+    assert str(result.exception).startswith('invalid JSON record (line 2): ')
+    expected = [
+        'skipped: line 2: %s: ' % get_json_error_name('{bad'),
+        'skipped: line 3: ValueError: the record is not a JSON object',
+        'summary: 2 records, 2 skipped',
+    ]
+    result = clirunner_invoke_piped(sut.cli, ['--ndjson', '--skip-invalid', 'flatten', '-c'], input_text, exit_code=0,
+                                    out_contains_seq=expected)
+    assert '{"a":1}\n{"b":2}\n' in result.output
+
+
+def test_skip_invalid_requires_ndjson():
+    result = clirunner_invoke_piped(sut.cli, ['--skip-invalid', 'info'], '{"a": 1}', exit_code=2)
+    assert '--skip-invalid requires --ndjson' in result.output
+
+
+def test_ndjson_multiple_inputs(tmpdir):
+    tmpdir.join('1.ndjson').write('{"a": 1}\n{"b": 2}\n')
+    cli_args = ['--ndjson', '-I', str(tmpdir), 'format', '-c']
+    expected = '==> %s <==\n{"a":1}\n{"b":2}\n' % tmpdir.join('1.ndjson')
+    clirunner_invoke_piped(sut.cli, cli_args, '', exit_code=0, out_contains=expected)
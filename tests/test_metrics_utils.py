@@ -0,0 +1,80 @@
+from collections import OrderedDict
+
+import pytest
+
+from clifunzone.metrics_utils import CounterMetric
+from clifunzone.metrics_utils import CountMetric
+from clifunzone.metrics_utils import ListMetric
+from clifunzone.metrics_utils import Metric
+from clifunzone.metrics_utils import MetricsCollector
+
+NODES = [
+    {'type': 'Feature', 'keyword': 'Feature', 'name': 'abc'},
+    {'type': 'Scenario', 'keyword': 'Scenario', 'name': 'def'},
+    {'type': 'Step', 'keyword': 'Given ', 'text': 'a'},
+    {'type': 'Step', 'keyword': 'And ', 'text': 'b'},
+    {'type': 'Comment'},
+    {'type': 'Scenario', 'keyword': 'Scenario', 'name': 'ghi'},
+    {'type': 'Step', 'keyword': 'Given ', 'text': 'c'},
+]
+
+
+def collect(metrics, nodes=NODES):
+    return MetricsCollector(OrderedDict(metrics), node_type=lambda node: node.get('type')).collect(nodes)
+
+
+def test_metric_abstract():
+    with pytest.raises(TypeError):
+        Metric()
+
+
+def test_dispatch_by_type():
+    results = collect([
+        ('Scenarios', ListMetric(['Scenario'], lambda node: node['name'])),
+        ('Steps', ListMetric(['Step'], lambda node: node['text'])),
+        ('Steps and Scenarios', CountMetric(['Step', 'Scenario'])),
+        ('Tables', CountMetric(['DataTable'])),
+    ])
+    assert results == OrderedDict([
+        ('Scenarios', ['def', 'ghi']),
+        ('Steps', ['a', 'b', 'c']),
+        ('Steps and Scenarios', 5),
+        ('Tables', 0),
+    ])
+
+
+def test_any_type():
+    results = collect([
+        ('Nodes', CountMetric()),
+        ('Types', CounterMetric(func=lambda node: node['type'])),
+    ])
+    assert results['Nodes'] == 7
+    assert results['Types'] == {'Feature': 1, 'Scenario': 2, 'Step': 3, 'Comment': 1}
+
+
+def test_any_type_without_node_type():
+    # i.e. node_type is only required by the metrics which are interested in specific node types
+    collector = MetricsCollector({'Nodes': CountMetric(), 'Values': ListMetric()})
+    assert collector.collect(['a', None, 'b']) == {'Nodes': 3, 'Values': ['a', None, 'b']}
+
+
+def test_counter_metric_ignores_none():
+    results = collect([('Keywords', CounterMetric(func=lambda node: node.get('keyword')))])
+    assert results['Keywords'] == {'Feature': 1, 'Scenario': 2, 'Given ': 2, 'And ': 1}
+    assert None not in results['Keywords']
+
+
+def test_custom_metric():
+    class LengthMetric(Metric):
+        def __init__(self, types=None, func=None):
+            super(LengthMetric, self).__init__(types, func)
+            self.total = 0
+
+        def visit(self, node):
+            self.total += len(self.extract(node))
+
+        def result(self):
+            return self.total
+
+    results = collect([('Text', LengthMetric(['Step', 'Scenario'], lambda node: node.get('text', node.get('name'))))])
+    assert results == OrderedDict([('Text', 9)])
@@ -90,7 +90,11 @@ def test_echo(input_text):
     ('<a>\t<b><c/> </b></a>',
      '{"robot":{"messages":0,"suites":0,"tests":0},' +
      '"xml":{"content":{"#text":"\\t","tag":"a"},"metrics":{"children":{"attributes":[],"count":1,"tags":["b"]},' +
-     '"descendants":{"attributes":[],"count":2,"tags":["b","c"]}}}}')
+     '"descendants":{"attributes":[],"count":2,"tags":["b","c"]}}}}'),
+    ('<robot><suite><test><kw><msg/><msg/></kw></test><suite><test/></suite></suite></robot>',
+     '{"robot":{"messages":2,"suites":2,"tests":2},' +
+     '"xml":{"content":{"tag":"robot"},"metrics":{"children":{"attributes":[],"count":1,"tags":["suite"]},' +
+     '"descendants":{"attributes":[],"count":7,"tags":["kw","msg","suite","test"]}}}}')
 ])
 def test_info(input_text, expected):
     clirunner_invoke_piped(sut.info, [], input_text, exit_code=0, out_json=expected)
@@ -1,4 +1,7 @@
+import json
+import re
 import sys
+from collections import Counter
 
 import pytest
 from click_testing_utils import clirunner_invoke_piped
@@ -192,6 +195,44 @@ def test_info_fragments(input_text, cli_args, expected):
     clirunner_invoke_piped(sut.info, cli_args, input_text, exit_code=0, out_contains_seq=expected)
 
 
+@pytest.mark.parametrize("cli_args", [
+    [],
+    ['-f'],
+])
+@pytest.mark.skipif(sys.version_info > (3, 3),
+                    reason="currently broken for py35")
+def test_info_jobs(tmpdir, cli_args):
+    path = tmpdir.join('input.txt')
+    path.write(txt_utils.lorem_ipsum())
+    expected = clirunner_invoke_piped(sut.info, cli_args + ['-i', str(path)], exit_code=0).output
+    for jobs in ['2', '3', '64']:
+        clirunner_invoke_piped(sut.info, cli_args + ['-i', str(path), '-j', jobs], exit_code=0, out_eq=expected.rstrip())
+
+
+@pytest.mark.parametrize("chunks", [
+    [b'Lorem ipsum, dolor.\n', b'Lorem\t sit \xc3\xa9 amet'],
+    [txt_utils.lorem_ipsum().encode('ascii')],
+    [b''],
+])
+@pytest.mark.parametrize("encoding", [None, 'latin-1', 'utf-8'])
+def test_count_stream_numpy(monkeypatch, chunks, encoding):
+    pytest.importorskip('numpy')
+    monkeypatch.setattr(txt_utils, 'NUMPY_CHAR_COUNTS', False)
+    expected = txt_utils.count_stream(chunks, encoding=encoding)
+    monkeypatch.setattr(txt_utils, 'NUMPY_CHAR_COUNTS', True)
+    assert txt_utils.count_stream(chunks, encoding=encoding) == expected
+
+
+@pytest.mark.parametrize("numpy_char_counts", [False, True])
+def test_count_stream_multibyte_encoding(monkeypatch, numpy_char_counts):
+    monkeypatch.setattr(txt_utils, 'NUMPY_CHAR_COUNTS', numpy_char_counts)
+    chunks = [b'caf\xc3', b'\xa9 ', b'\xe2\x82', b'\xac']
+    chars, words = txt_utils.count_stream(chunks, encoding='utf-8')
+    assert chars == Counter({u'c': 1, u'a': 1, u'f': 1, u'\xe9': 1, u' ': 1, u'\u20ac': 1})
+    chars, words = txt_utils.count_stream(chunks)
+    assert sum(chars.values()) == 9
+
+
 @pytest.mark.parametrize("cli_args,expected", [
     ([], [
         'Lorem ipsum dolor sit amet, consectetur adipiscing elit.',
@@ -238,6 +279,19 @@ def test_split(input_text, cli_args, expected):
     clirunner_invoke_piped(sut.split, cli_args, input_text, exit_code=0, out_eq=expected)
 
 
+@pytest.mark.parametrize("input_text,cli_args,expected", [
+    ("Hi! How are you?\nMy name is John-Paul. ", [],
+     "Hi!\nHow\nare\nyou?\nMy\nname\nis\nJohn-Paul."),
+    ("Hi! How are you?\nMy name is John-Paul. ", ['-sw', '-sep', '|'],
+     "Hi|How|are|you|My|name|is|John-Paul"),
+    ("", [], ""),
+])
+def test_split_file(tmpdir, input_text, cli_args, expected):
+    path = tmpdir.join('input.txt')
+    path.write(input_text)
+    clirunner_invoke_piped(sut.split, cli_args + ['-i', str(path)], exit_code=0, out_eq=expected)
+
+
 @pytest.mark.parametrize("input_text,cli_args,expected", [
     ('Lorem ipsum dolor sit amet', ['-v1', 'Lorem', '-v2', 'sit', '-v2', 'amet'],
      "{'max': 4, 'mean': 3.5, 'min': 3}"),
@@ -278,3 +332,71 @@ def test_distance_lorem(cli_args, expected):
     input_text = txt_utils.get_words(input_text)
     input_text = '\n'.join(input_text)
     clirunner_invoke_piped(sut.distance, cli_args, input_text, exit_code=0, out_eq=expected)
+
+
+@pytest.mark.parametrize("regex_flags", [None, re.IGNORECASE])
+def test_get_matcher_many_patterns(regex_flags):
+    # i.e. more patterns than the re module (on py2) allows groups in a single pattern
+    values = ['^x%d$' % i for i in range(250)] + [r'(y)\1']
+    matcher = txt_utils.get_matcher(values, regex=True, regex_flags=regex_flags)
+    items = ['x0', 'x98', 'x99', 'x198', 'x249', 'x250', 'yy']
+    assert [matcher(item) for item in items] == [0, 98, 99, 198, 249, None, 250]
+
+
+@pytest.mark.parametrize("cli_args,expected", [
+    (['-v1', 'Lorem', '-v2', 'sit', '-v2', 'amet'],
+     "{'max': 852, 'mean': 483.5, 'min': 3}"),
+    (['-v1', 'lorem', '-v1', 'dolor', '-v2', 'consectetur', '-v2', 'adipiscing'],
+     "{'max': 889, 'mean': 467.0740740740741, 'min': 3}"),
+    (['-r', '-ri', '-v1', '^Pellentesque$', '-v2', '^Vivamus'],
+     "{'max': 910, 'mean': 287.1212121212121, 'min': 21}"),
+    (['-r', '-v1', '^Pellentesque$', '-v2', '^Vivamus', '-v'],
+     "{'max': 528, 'mean': 222.66666666666666, 'matches1': {'Pellentesque': set([328, 99, 213, 478])}, " +
+     "'matches2': {'Vivamus': set([45, 270, 143, 529, 627, 502])}, 'min': 24}"),
+])
+@pytest.mark.skipif(sys.version_info > (3, 3),
+                    reason="currently broken for py35")
+def test_distance_index(tmpdir, cli_args, expected):
+    input_text = txt_utils.lorem_ipsum()
+    input_text = txt_utils.get_words(input_text)
+    input_text = '\n'.join(input_text)
+    path = tmpdir.join('input.txt')
+    path.write(input_text)
+    clirunner_invoke_piped(sut.index, ['-i', str(path)], exit_code=0,
+                           out_json=json.dumps({'count': 1009, 'path': str(path) + '.index', 'tokens': 182}))
+    clirunner_invoke_piped(sut.distance, cli_args + ['-i', str(path)], exit_code=0, out_eq=expected)
+    clirunner_invoke_piped(sut.distance, cli_args + ['-i', str(path), '--index'], exit_code=0, out_eq=expected)
+
+
+@pytest.mark.skipif(sys.version_info > (3, 3),
+                    reason="currently broken for py35")
+def test_distance_index_stale(tmpdir):
+    path = tmpdir.join('input.txt')
+    index_path = tmpdir.join('input.idx')
+    path.write('a\nb\nc')
+    args = ['-i', str(path), '--index-file', str(index_path), '-v1', 'a', '-v2', 'c']
+    clirunner_invoke_piped(sut.distance, args, exit_code=0, out_eq="{'max': 2, 'mean': 2.0, 'min': 2}")
+    assert index_path.check()
+    path.write('a\nc\nb')
+    clirunner_invoke_piped(sut.distance, args, exit_code=0, out_eq="{'max': 1, 'mean': 1.0, 'min': 1}")
+    index_path.write('garbage')
+    clirunner_invoke_piped(sut.distance, args, exit_code=0, out_eq="{'max': 1, 'mean': 1.0, 'min': 1}")
+
+
+@pytest.mark.skipif(sys.version_info > (3, 3),
+                    reason="currently broken for py35")
+def test_distance_index_unchanged_stat(tmpdir, monkeypatch):
+    path = tmpdir.join('input.txt')
+    path.write('a\nb\nc')
+    path.setmtime(path.mtime() - 10)
+    clirunner_invoke_piped(sut.index, ['-i', str(path)], exit_code=0)
+    hashed = []
+    get_content_hash = txt_utils.get_content_hash
+    monkeypatch.setattr(txt_utils, 'get_content_hash', lambda chunks: hashed.append(1) or get_content_hash(chunks))
+    args = ['-i', str(path), '--index', '-v1', 'a', '-v2', 'c']
+    clirunner_invoke_piped(sut.distance, args, exit_code=0, out_eq="{'max': 2, 'mean': 2.0, 'min': 2}")
+    assert not hashed
+    # i.e. a touched (but unchanged) input is hashed, but the index is still used
+    path.setmtime(path.mtime() + 5)
+    clirunner_invoke_piped(sut.distance, args, exit_code=0, out_eq="{'max': 2, 'mean': 2.0, 'min': 2}")
+    assert len(hashed) == 1
@@ -0,0 +1,98 @@
+import itertools
+import sys
+from collections import Mapping
+from collections import OrderedDict
+from collections import Sequence
+from collections import Set
+
+import pytest
+from six import iteritems
+from six import string_types
+
+from clifunzone.walk_items import iter_walk
+from clifunzone.walk_items import walk_items
+
+DATA = OrderedDict([
+    ('a', ['aa', 1, {'ab': [2, 'ac']}]),
+    ('b', {'ba': 2, 'bb': {'bba': (3, 4)}}),
+    ('c', ('ca', [5, [6, []]], set(['cb']))),
+    ('d', OrderedDict([('da', {}), ('db', 'dbb')])),
+    ('e', 7),
+])
+
+
+def recursive_walk_items(obj, values_only=False, ancestors=True, keys_as_ancestors=False, obj_ancestors=(), key=None,
+                         prune=None):
+    """
+    The original (recursive) implementation of walk_items(), plus the prune param.
+    """
+    is_map = isinstance(obj, Mapping)
+    is_seq = isinstance(obj, (Sequence, Set)) and not isinstance(obj, string_types)
+    is_collection = bool(is_map or is_seq)
+    if not values_only or not is_collection:
+        if ancestors:
+            yield len(obj_ancestors), key, obj, obj_ancestors
+        else:
+            yield len(obj_ancestors), key, obj
+    if is_collection and not (prune and prune(len(obj_ancestors), key, obj)):
+        if is_map:
+            items = iteritems(obj)
+        elif is_seq:
+            items = enumerate(obj)
+        for key, value in items:
+            obj_ancestors2 = obj_ancestors + (obj,)
+            if keys_as_ancestors:
+                obj_ancestors2 += (key,)
+            for child in recursive_walk_items(value, obj_ancestors=obj_ancestors2, key=key, values_only=values_only,
+                                              ancestors=ancestors, keys_as_ancestors=keys_as_ancestors, prune=prune):
+                yield child
+
+
+PRUNES = [
+    None,
+    lambda depth, key, value: key == 'b',
+    lambda depth, key, value: depth >= 2,
+    lambda depth, key, value: isinstance(value, list),
+]
+
+
+@pytest.mark.parametrize("values_only,ancestors,keys_as_ancestors,prune",
+                         list(itertools.product([False, True], [False, True], [False, True], PRUNES)))
+@pytest.mark.parametrize("obj", [
+    DATA,
+    [DATA, [DATA]],
+    'abc',
+    1,
+    [],
+])
+def test_walk_items_matches_recursive(obj, values_only, ancestors, keys_as_ancestors, prune):
+    kwargs = dict(values_only=values_only, ancestors=ancestors, keys_as_ancestors=keys_as_ancestors, prune=prune)
+    assert list(walk_items(obj, **kwargs)) == list(recursive_walk_items(obj, **kwargs))
+
+
+@pytest.mark.parametrize("obj_ancestors,key", [
+    (('root',), 'x'),
+    (('root', 'x'), 'y'),
+    ((DATA, 'a', DATA['a']), 2),
+])
+@pytest.mark.parametrize("values_only,keys_as_ancestors", list(itertools.product([False, True], [False, True])))
+def test_walk_items_obj_ancestors(obj_ancestors, key, values_only, keys_as_ancestors):
+    kwargs = dict(values_only=values_only, keys_as_ancestors=keys_as_ancestors, obj_ancestors=obj_ancestors, key=key)
+    actual = list(walk_items(DATA['a'], **kwargs))
+    assert actual == list(recursive_walk_items(DATA['a'], **kwargs))
+    assert all(a[:len(obj_ancestors)] == obj_ancestors for depth, k, v, a in actual)
+
+
+@pytest.mark.parametrize("values_only,keys_as_ancestors", list(itertools.product([False, True], [False, True])))
+def test_iter_walk_paths(values_only, keys_as_ancestors):
+    kwargs = dict(values_only=values_only, keys_as_ancestors=keys_as_ancestors)
+    actual = [(depth, key, value, path.as_tuple()) for depth, key, value, path in iter_walk(DATA, **kwargs)]
+    assert actual == list(recursive_walk_items(DATA, **kwargs))
+
+
+def test_iter_walk_deeper_than_recursion_limit():
+    depth = sys.getrecursionlimit() * 2
+    obj = 'leaf'
+    for _ in range(depth):
+        obj = [obj]
+    assert list(walk_items(obj, values_only=True, ancestors=False)) == [(depth, 0, 'leaf')]
@@ -1,3 +1,4 @@
+import json
 import sys
 
 import pytest
@@ -23,7 +24,7 @@ def test_none_debug():
         " 'args': [],",
         " 'auto_envvar_prefix': None,",
         " 'color': None,",
-        " 'command': <click.core.Group object at 0x10c6d5ed0>,",
+        " 'command': <clifunzone.click_utils.MultiInputGroup object at 0x10c6d5ed0>,",
         " 'default_map': None,",
         " 'help_option_names': ['-h', '--help'],",
         " 'ignore_unknown_options': False,",
@@ -31,7 +32,7 @@ def test_none_debug():
         " 'invoked_subcommand': None,",
         " 'max_content_width': None,",
         " 'obj': None,",
-        " 'params': {'debug': True},",
+        " 'params': {'debug': True, 'inputs': (), 'jobs': 1},",
         " 'parent': None,",
         " 'protected_args': [],",
         " 'resilient_parsing': False,",
@@ -50,7 +51,7 @@ def test_none_debug():
         " 'args': [],",
         " 'auto_envvar_prefix': None,",
         " 'color': None,",
-        " 'command': <click.core.Group object at 0x10c6d5ed0>,",
+        " 'command': <clifunzone.click_utils.MultiInputGroup object at 0x10c6d5ed0>,",
         " 'default_map': None,",
         " 'help_option_names': ['-h', '--help'],",
         " 'ignore_unknown_options': False,",
@@ -58,7 +59,7 @@ def test_none_debug():
         " 'invoked_subcommand': None,",
         " 'max_content_width': None,",
         " 'obj': None,",
-        " 'params': {'debug': True},",
+        " 'params': {'debug': True, 'inputs': (), 'jobs': 1},",
         " 'parent': None,",
         " 'protected_args': [],",
         " 'resilient_parsing': False,",
@@ -219,6 +220,61 @@ def test_tojson(input_text, cli_args, expected):
     clirunner_invoke_piped(sut.tojson, cli_args, input_text, exit_code=0, out_json=expected)
 
 
+@pytest.mark.parametrize("input_text,cli_args,expected", [
+    ('<royg> <r/> <o/> <y/> <r e="d"/> <g/></royg>', ['-sws'],
+     '{"royg": {"r": [null, {"@e": "d"}], "o": null, "y": null, "g": null}}'),
+    ('<royg> <r/> <o/> <y/> <r e="d"/> <g/></royg>', ['-sws', '-p'], [
+        '{',
+        '    "royg": {',
+        '        "r": [',
+        '            null,',
+        '            {',
+        '                "@e": "d"',
+        '            }',
+        '        ],',
+        '        "o": null,',
+        '        "y": null,',
+        '        "g": null',
+        '    }',
+        '}'
+    ]),
+])
+def test_tojson_exact(input_text, cli_args, expected):
+    clirunner_invoke_piped(sut.tojson, cli_args, input_text, exit_code=0, out_eq=expected)
+
+
+@pytest.mark.parametrize("input_text,cli_args,expected", [
+    ('<rs><r id="1"/><r>x</r></rs>', ['-r', '//r'], [
+        '{"r": {"@id": "1"}}',
+        '{"r": "x"}'
+    ]),
+    ('<rs>\n<r id="1"/>\n<r>x</r>\n</rs>', ['-r', '/rs/r'], [
+        '{"r": {"@id": "1", "#tail": "\\n"}}',
+        '{"r": {"#tail": "\\n", "#text": "x"}}'
+    ]),
+    ('<rs>\n<r id="1"/>\n<r>x</r>\n</rs>', ['-r', '/rs/r', '-sws', '-sa'], [
+        '{"r": null}',
+        '{"r": "x"}'
+    ]),
+    ('<rs><r><r/></r><q/></rs>', ['-r', '//r'], [
+        '{"r": {"r": null}}',
+        '{"r": null}'
+    ]),
+    ('<rs><r/></rs>', ['-r', '/r'], ''),
+])
+def test_tojson_records(input_text, cli_args, expected):
+    clirunner_invoke_piped(sut.tojson, cli_args, input_text, exit_code=0, out_eq=expected)
+
+
+@pytest.mark.parametrize("input_text,cli_args", [
+    ('<rs><r/></rs>', ['-r', '//r', '-p']),
+    ('<rs><r/></rs>', ['-r', '//r[1]']),
+    ('<rs><r/>', ['-r', '//r']),
+])
+def test_tojson_records_invalid(input_text, cli_args):
+    clirunner_invoke_piped(sut.tojson, cli_args, input_text, exit_code=-1)
+
+
 @pytest.mark.parametrize("input_text,cli_args,expected", [
     ('<abc/>', ['--echo'], [
         '',
@@ -272,6 +328,38 @@ def test_elements_as_lines(input_text, cli_args, expected):
     clirunner_invoke_piped(sut.elements, cli_args, input_text, exit_code=0, out_ok=expected)
 
 
+@pytest.mark.parametrize("input_text,cli_args,expected", [
+    ('<abc/>', ['--stream'], ['{"path":"/abc","content":{"tag":"abc"}}']),
+    ('<a>\t<b><c/> </b></a>', ['--stream'], [
+        '{"path":"/a/b[1]/c[1]","content":{"tag":"c"}}',
+        '{"path":"/a/b[1]","content":{"tag":"b"},' +
+        '"metrics":{"children":{"count":1,"tags":["c"]},"descendants":{"count":1,"tags":["c"]}}}',
+        '{"path":"/a","content":{"tag":"a","#text":"\\t"},' +
+        '"metrics":{"children":{"count":1,"tags":["b"]},"descendants":{"count":2,"tags":["b","c"]}}}'
+    ]),
+    ('<a><b x="1"><c/></b><b><d y="2"/></b></a>', ['--stream'], [
+        '{"path":"/a/b[1]/c[1]","content":{"tag":"c"}}',
+        '{"path":"/a/b[1]","content":{"attributes":{"@x":"1"},"tag":"b"},' +
+        '"metrics":{"children":{"count":1,"tags":["c"]},"descendants":{"count":1,"tags":["c"]}}}',
+        '{"path":"/a/b[2]/d[1]","content":{"attributes":{"@y":"2"},"tag":"d"}}',
+        '{"path":"/a/b[2]","content":{"tag":"b"},' +
+        '"metrics":{"children":{"count":1,"attributes":["@y"],"tags":["d"]},' +
+        '"descendants":{"count":1,"attributes":["@y"],"tags":["d"]}}}',
+        '{"path":"/a","content":{"tag":"a"},' +
+        '"metrics":{"children":{"count":2,"attributes":["@x"],"tags":["b"]},' +
+        '"descendants":{"count":4,"attributes":["@x","@y"],"tags":["b","c","d"]}}}'
+    ])
+])
+def test_elements_stream(input_text, cli_args, expected):
+    # Note: the lines are compared as (parsed) JSON, since the order of the keys differs between py2 and py3
+    result = clirunner_invoke_piped(sut.elements, cli_args, input_text, exit_code=0)
+    assert [json.loads(line) for line in result.output.splitlines()] == [json.loads(line) for line in expected]
+
+
+def test_elements_stream_pretty():
+    clirunner_invoke_piped(sut.elements, ['--stream', '-p'], '<a/>', exit_code=-1, out_ok=None)
+
+
 @pytest.mark.parametrize("input_text", [
     '',
     ' ',
@@ -403,6 +491,11 @@ def test_strip_invalid_input(input_text):
      '<b id="b1"><c/></b>\n<d><e/></d>'),
     ('<a><b id="b1"><c/></b><b id="b2"><d><e/></d><d/></b></a>', ['-nr', '-x //*[./e]', '-x //b[@id="b1"]'],
      '<d><e/></d>\n<b id="b1"><c/></b>'),
+    ('<a><b><c/></b><b><d><e/></d><d/></b></a>', ['-x /a/b/d'], '<results>\n<d><e/></d>\n<d/>\n</results>'),
+    ('<a><b><c/></b><b><d><e/></d><d/></b></a>', ['-nr', '-x /b/d'], ''),
+    ('<a><b><c/></b><b><d><e/></d><d/></b></a>', ['-nr', '-x /a//*'],
+     '<b><c/></b>\n<c/>\n<b><d><e/></d><d/></b>\n<d><e/></d>\n<e/>\n<d/>'),
+    ('<a><b>1<b>2</b>t</b>x</a>', ['-nr', '-x //b'], '<b>1<b>2</b>t</b>x\n<b>2</b>t'),
 ])
 def test_find(input_text, cli_args, expected):
     clirunner_invoke_piped(sut.find, cli_args, input_text, exit_code=0, out_xml=expected)
@@ -419,3 +512,50 @@ def test_find(input_text, cli_args, expected):
 ])
 def test_find_invalid_input(input_text):
     clirunner_invoke_piped(sut.find, [], input_text, exit_code=-1, out_ok=None)
+
+
+@pytest.mark.parametrize("input_text,cli_args,expected", [
+    ('<a><b><c/></b></a>', ['-d', 'find', '-x', '//b', '-x', '//b'], [
+        '<b><c/></b>',
+        "xpath cache: {",
+    ]),
+    ('<a><b><c/></b></a>', ['-d', 'strip', '-x', '//c'], [
+        '<a><b/></a>',
+        "xpath cache: {",
+    ]),
+])
+def test_debug_xpath_cache_info(input_text, cli_args, expected):
+    clirunner_invoke_piped(sut.cli, cli_args, input_text, exit_code=0, out_contains_seq=expected)
+
+
+@pytest.mark.parametrize("jobs", ['1', '2'])
+def test_multiple_inputs(tmpdir, jobs):
+    tmpdir.join('1.xml').write('<a><b/></a>')
+    tmpdir.join('2.xml').write('<a>')
+    tmpdir.join('3.xml').write('<c x="1"/>')
+    cli_args = ['-I', str(tmpdir), '-I', str(tmpdir.join('*.none')), '-j', jobs, 'tojson', '-sws']
+    expected = [
+        '==> %s <==\n{"a": {"b": null}}\n' % tmpdir.join('1.xml'),
+        '==> %s <==\n' % tmpdir.join('2.xml'),
+        '==> %s <==\n{"c": {"@x": "1"}}\n' % tmpdir.join('3.xml'),
+        '==> %s <==\n' % tmpdir.join('*.none'),
+        'summary: 4 inputs, 2 succeeded, 2 failed',
+        'failed: %s: ParseError: ' % tmpdir.join('2.xml'),
+        'failed: %s: Invalid value for "--input"' % tmpdir.join('*.none'),
+    ]
+    clirunner_invoke_piped(sut.cli, cli_args, '', exit_code=1, out_contains_seq=expected)
+
+
+def test_multiple_inputs_glob(tmpdir):
+    tmpdir.join('1.xml').write('<a><b/></a>')
+    tmpdir.join('2.txt').write('<a>')
+    cli_args = ['-I', str(tmpdir.join('*.xml')), 'find', '-x', '//b']
+    expected = [
+        '==> %s <==' % tmpdir.join('1.xml'),
+        '<results>',
+        '<b/>',
+        '</results>',
+        '',
+        'summary: 1 inputs, 1 succeeded, 0 failed'
+    ]
+    clirunner_invoke_piped(sut.cli, cli_args, '', exit_code=0, out_eq=expected)